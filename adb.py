@@ -0,0 +1,128 @@
+# adb.py
+# Awaitable versions of the db.py helpers. pymongo is blocking, so every call
+# is pushed onto a bounded thread pool instead of running on the Pyrogram
+# event loop. Handlers should only ever talk to the database through here.
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+import config
+import db
+
+_executor = ThreadPoolExecutor(max_workers=config.DB_POOL_SIZE, thread_name_prefix="db")
+
+async def run(fn, *args, **kwargs):
+    """Run a blocking db function on the db thread pool and await the result."""
+    loop = asyncio.get_running_loop()
+    # carry the caller's context into the worker thread (per-update accounting)
+    ctx = contextvars.copy_context()
+    return await loop.run_in_executor(_executor, functools.partial(ctx.run, fn, *args, **kwargs))
+
+def shutdown():
+    _executor.shutdown(wait=True)
+
+# Categories / stories
+async def get_categories():
+    return await run(db.get_categories)
+
+async def get_category(slug):
+    return await run(db.get_category, slug)
+
+async def upsert_category(slug, name=None):
+    return await run(db.upsert_category, slug, name)
+
+async def gen_vision_id(category_slug, prefix=None):
+    return await run(db.gen_vision_id, category_slug, prefix)
+
+async def add_story(category_slug, title, photo_file_id, description, created_by):
+    return await run(db.add_story, category_slug, title, photo_file_id, description, created_by)
+
+async def get_story_by_vision(vision_id):
+    return await run(db.get_story_by_vision, vision_id)
+
+async def get_stories_page(slug, cursor=None, direction="next", limit=10):
+    return await run(db.get_stories_page, slug, cursor, direction, limit)
+
+async def get_all_stories():
+    return await run(db.get_all_stories)
+
+async def get_stories_since(created_at):
+    return await run(db.get_stories_since, created_at)
+
+# Episodes
+async def add_episode(vision_id, ep_no=None, link=None, short=False, ep_no_start=None, ep_no_end=None):
+    return await run(db.add_episode, vision_id, ep_no=ep_no, link=link, short=short,
+                     ep_no_start=ep_no_start, ep_no_end=ep_no_end)
+
+async def add_episodes(vision_id, items):
+    return await run(db.add_episodes, vision_id, items)
+
+async def get_episodes_since(added_at):
+    return await run(db.get_episodes_since, added_at)
+
+async def get_episodes(vision_id):
+    return await run(db.get_episodes, vision_id)
+
+async def find_episode_single(vision_id, ep_no):
+    return await run(db.find_episode_single, vision_id, ep_no)
+
+async def find_shortlink_for_range(vision_id, start, end):
+    return await run(db.find_shortlink_for_range, vision_id, start, end)
+
+# Requests
+async def add_requests(docs):
+    return await run(db.add_requests, docs)
+
+async def apply_request_deltas(deltas, max_users=20):
+    return await run(db.apply_request_deltas, deltas, max_users)
+
+async def get_open_request_groups():
+    return await run(db.get_open_request_groups)
+
+async def get_request_groups_page(skip, limit):
+    return await run(db.get_request_groups_page, skip, limit)
+
+async def get_request_digest():
+    return await run(db.get_request_digest)
+
+async def ack_request_digest(groups):
+    return await run(db.ack_request_digest, groups)
+
+async def close_request_group(group_id):
+    return await run(db.close_request_group, group_id)
+
+# State helpers
+async def set_state(user_id, state_dict):
+    return await run(db.set_state, user_id, state_dict)
+
+async def get_state(user_id):
+    return await run(db.get_state, user_id)
+
+async def clear_state(user_id):
+    return await run(db.clear_state, user_id)
+
+async def flush_states(upserts, deletes):
+    return await run(db.flush_states, upserts, deletes)
+
+# Auto-delete helpers
+async def add_pending_deletes(docs):
+    return await run(db.add_pending_deletes, docs)
+
+async def get_pending_deletes():
+    return await run(db.get_pending_deletes)
+
+async def remove_pending_deletes(ids):
+    return await run(db.remove_pending_deletes, ids)
+
+# Admin list helpers
+async def get_admins_doc():
+    return await run(db.get_admins_doc)
+
+async def is_admin(user_id):
+    return await run(db.is_admin, user_id)
+
+async def add_admin(uid):
+    return await run(db.add_admin, uid)
+
+async def set_owner(uid):
+    return await run(db.set_owner, uid)
@@ -0,0 +1,64 @@
+# authz.py
+# In-memory owner/admin set so authorization checks are O(1) set lookups with
+# no I/O. Loaded once, refreshed in the background every ADMIN_CACHE_SECONDS,
+# and updated immediately by add_admin / set_owner.
+import asyncio
+import time
+import adb
+import config
+
+_owner_id = None
+_admins = frozenset()
+_loaded_at = 0.0
+_refresh_task = None
+
+async def refresh():
+    """Reload the admin list doc from Mongo."""
+    global _owner_id, _admins, _loaded_at
+    doc = await adb.get_admins_doc()
+    _owner_id = doc.get("owner_id")
+    _admins = frozenset(doc.get("admins", []))
+    _loaded_at = time.monotonic()
+
+async def _ensure_fresh():
+    global _refresh_task
+    if not _loaded_at:
+        # first use: nothing to serve yet, so wait for the load
+        await refresh()
+        return
+    if time.monotonic() - _loaded_at < config.ADMIN_CACHE_SECONDS:
+        return
+    # stale: keep answering from memory while a single refresh runs
+    if _refresh_task is None or _refresh_task.done():
+        _refresh_task = asyncio.ensure_future(refresh())
+
+def invalidate():
+    """Force the next check to reload from Mongo."""
+    global _loaded_at
+    _loaded_at = 0.0
+
+async def is_admin(user_id):
+    await _ensure_fresh()
+    return user_id == _owner_id or user_id in _admins or user_id in config.ADMIN_IDS
+
+async def get_owner_id():
+    await _ensure_fresh()
+    return _owner_id
+
+async def get_admin_ids():
+    """Owner plus every admin, e.g. for notifications."""
+    await _ensure_fresh()
+    ids = set(_admins) | set(config.ADMIN_IDS)
+    # OWNER_ID from config is the owner even when the admins doc has none
+    ids.update(i for i in (_owner_id, config.OWNER_ID) if i is not None)
+    return ids
+
+async def add_admin(uid):
+    global _admins
+    await adb.add_admin(uid)
+    _admins = _admins | {uid}
+
+async def set_owner(uid):
+    global _owner_id
+    await adb.set_owner(uid)
+    _owner_id = uid
@@ -0,0 +1,143 @@
+# autodelete.py
+# Deletes delivered content (story photos, pages, episode links) from user
+# chats AUTO_DELETE_MINUTES after sending. Pending deletions live in a heap
+# served by a single timer task that sleeps until the earliest deadline, so
+# tens of thousands of them cost neither a task per message nor polling. They
+# are also persisted to the pending_deletes collection (inserts coalesced into
+# one insert_many per second) so a restart picks them up again.
+import asyncio
+import datetime
+import heapq
+import itertools
+import time
+import adb
+import config
+import db
+import metrics
+import sender
+
+DELETE_BATCH = 100        # Telegram's max message ids per delete_messages call
+PERSIST_DELAY = 1.0       # seconds to coalesce new entries before insert_many
+
+_heap = []                # (due_ts, seq, chat_id, message_ids, doc_id)
+_seq = itertools.count()
+_unsaved = []             # docs waiting for insert_many
+_client = None
+_wakeup = None
+_task = None
+_persist_handle = None
+
+def enabled():
+    return config.AUTO_DELETE_MINUTES > 0 and _client is not None
+
+def _ids(sent):
+    """Message ids from a send result: Message, list of Messages (media group), or None."""
+    if sent is None:
+        return []
+    if isinstance(sent, (list, tuple)):
+        return [i for s in sent for i in _ids(s)]
+    mid = getattr(sent, "id", None)
+    return [mid] if mid is not None else []
+
+def track(chat_id, *sent):
+    """Schedule deletion of the messages returned by one or more sends to chat_id."""
+    if not enabled():
+        return
+    ids = [i for s in sent for i in _ids(s)]
+    if not ids:
+        return
+    due = time.time() + config.AUTO_DELETE_MINUTES * 60
+    doc = {"_id": db.new_id(), "chat_id": chat_id, "message_ids": ids,
+           "due_at": datetime.datetime.utcfromtimestamp(due)}
+    _push(due, chat_id, ids, doc["_id"])
+    _unsaved.append(doc)
+    _schedule_persist()
+
+def _push(due, chat_id, ids, doc_id):
+    earliest = _heap[0][0] if _heap else None
+    heapq.heappush(_heap, (due, next(_seq), chat_id, ids, doc_id))
+    if _wakeup is not None and (earliest is None or due < earliest):
+        _wakeup.set()
+
+def _schedule_persist():
+    global _persist_handle
+    if _persist_handle is None:
+        loop = asyncio.get_running_loop()
+        _persist_handle = loop.call_later(PERSIST_DELAY, lambda: asyncio.ensure_future(_persist()))
+
+async def _persist():
+    global _unsaved, _persist_handle
+    _persist_handle = None
+    docs, _unsaved = _unsaved, []
+    if docs:
+        try:
+            await adb.add_pending_deletes(docs)
+        except Exception as e:
+            print("Failed saving pending deletes:", e)
+
+async def start(client, owns=None):
+    """
+    Load persisted deletions and start the timer task (no-op when disabled).
+    owns(chat_id) picks this process's share when several run (workers.py).
+    """
+    global _client, _wakeup, _task
+    if config.AUTO_DELETE_MINUTES <= 0:
+        return
+    _client = client
+    _wakeup = asyncio.Event()
+    for doc in await adb.get_pending_deletes():
+        if owns is not None and not owns(doc["chat_id"]):
+            continue
+        due = doc["due_at"].replace(tzinfo=datetime.timezone.utc).timestamp()
+        _push(due, doc["chat_id"], doc["message_ids"], doc["_id"])
+    _task = asyncio.ensure_future(_run())
+
+async def stop():
+    global _task
+    if _task is not None:
+        _task.cancel()
+        _task = None
+    await _persist()
+
+async def _run():
+    while True:
+        _wakeup.clear()
+        if not _heap:
+            await _wakeup.wait()
+            continue
+        wait = _heap[0][0] - time.time()
+        if wait > 0:
+            try:
+                # woken early if an earlier deadline is pushed
+                await asyncio.wait_for(_wakeup.wait(), timeout=wait)
+            except asyncio.TimeoutError:
+                pass
+            continue
+        await _delete_due()
+
+async def _delete_due():
+    now = time.time()
+    by_chat, doc_ids = {}, []
+    while _heap and _heap[0][0] <= now:
+        _, _, chat_id, ids, doc_id = heapq.heappop(_heap)
+        by_chat.setdefault(chat_id, []).extend(ids)
+        doc_ids.append(doc_id)
+    calls = []
+    for chat_id, ids in by_chat.items():
+        for i in range(0, len(ids), DELETE_BATCH):
+            calls.append(sender.send(chat_id, _client.delete_messages, chat_id, ids[i:i + DELETE_BATCH],
+                                     priority=sender.BULK))
+    # a failure (already deleted, too old) must not keep the rest alive
+    await asyncio.gather(*calls, return_exceptions=True)
+    # entries still buffered for insert_many were never saved; drop them there
+    done = set(doc_ids)
+    _unsaved[:] = [d for d in _unsaved if d["_id"] not in done]
+    try:
+        await adb.remove_pending_deletes(doc_ids)
+    except Exception as e:
+        print("Failed clearing pending deletes:", e)
+
+def pending():
+    return len(_heap)
+
+metrics.gauge("bot_pending_deletes", pending, help="Delivered messages waiting for auto-delete")
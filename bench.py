@@ -0,0 +1,386 @@
+# bench.py
+# Offline benchmark for the handlers.py entry points (messages, callbacks,
+# inline queries). Replays a weighted mix of explore, search, inline, listen,
+# request and admin flows from many concurrent virtual users against a fake
+# Telegram client and a local Mongo stand-in (mongomock by default, or a real
+# local mongod via DATABASE_URL), and reports per-flow p50/p99 latency, DB
+# round trips per update and outbound API calls per update.
+#
+#   python bench.py --users 50 --iterations 20 --db-latency 5
+#   python bench.py --backend mongo            # uses DATABASE_URL (local mongod)
+#   python bench.py --json out.json --baseline last.json   # fail on p99 regressions
+#
+# mongomock is a dev-only dependency: pip install mongomock
+import argparse
+import asyncio
+import contextvars
+import io
+import json
+import os
+import random
+import sys
+import time
+import updates
+
+# per-update counters; adb.run and sender carry the context into threads/tasks
+_counters = contextvars.ContextVar("bench_counters", default=None)
+
+def _count(key, n=1):
+    c = _counters.get()
+    if c is not None:
+        c[key] = c.get(key, 0) + n
+
+# ---------------------------------------------------------------- DB stand-in
+
+_DB_OPS = {"find", "find_one", "find_one_and_update", "insert_one", "insert_many", "update_one",
+           "update_many", "replace_one", "delete_one", "delete_many", "bulk_write",
+           "count_documents", "aggregate", "create_index"}
+
+class CountingCollection:
+    """Wraps a pymongo collection; each operation counts as one round trip (+ injected latency)."""
+    def __init__(self, coll, latency):
+        self._coll = coll
+        self._latency = latency
+
+    def __getattr__(self, name):
+        attr = getattr(self._coll, name)
+        if name not in _DB_OPS:
+            return attr
+        def op(*args, **kwargs):
+            _count("db")
+            if self._latency:
+                time.sleep(self._latency)   # runs on an adb worker thread
+            return attr(*args, **kwargs)
+        return op
+
+def setup_env(args):
+    os.environ.setdefault("OWNER_ID", "1")
+    os.environ.setdefault("DB_CHANNEL_ID", "-1000000000001")
+    if not args.telegram_limits:
+        # measure our own cost, not Telegram's pacing
+        os.environ.setdefault("SEND_GLOBAL_RATE", "1000000")
+        os.environ.setdefault("SEND_CHAT_RATE", "1000000")
+        os.environ.setdefault("SEND_CHAT_BURST", "1000000")
+    if args.backend == "mongomock":
+        try:
+            import mongomock
+        except ImportError:
+            sys.exit("mongomock is not installed: pip install mongomock (or use --backend mongo)")
+        import pymongo
+        pymongo.MongoClient = mongomock.MongoClient
+        os.environ["DATABASE_URL"] = "mongodb://localhost/bench"
+    elif not os.environ.get("DATABASE_URL"):
+        sys.exit("--backend mongo needs DATABASE_URL pointing at a local mongod (it will be wiped)")
+
+def wrap_collections(db, latency):
+    for name in ("categories", "stories", "episodes", "user_states", "admins", "requests",
+                 "request_groups", "pending_deletes"):
+        setattr(db, name, CountingCollection(getattr(db, name), latency))
+
+# --------------------------------------------------------------- fake client
+
+class FakeClient:
+    """Records outbound calls instead of talking to Telegram."""
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = 0
+        self.by_method = {}
+        self.last_markup = {}   # chat_id -> last reply_markup sent there
+        self.next_offsets = {}  # inline query id -> next_offset it was answered with
+        self._next_id = 1
+
+    async def _call(self, method, chat_id=None, reply_markup=None):
+        self.calls += 1
+        self.by_method[method] = self.by_method.get(method, 0) + 1
+        _count("api")
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if chat_id is not None and reply_markup is not None:
+            self.last_markup[chat_id] = reply_markup
+        self._next_id += 1
+        return updates.Message(self, {"chat_id": chat_id or 0, "message_id": self._next_id})
+
+    async def send_message(self, chat_id, text, reply_markup=None, **kwargs):
+        return await self._call("send_message", chat_id, reply_markup)
+
+    async def send_photo(self, chat_id, photo, caption=None, reply_markup=None, **kwargs):
+        return await self._call("send_photo", chat_id, reply_markup)
+
+    async def send_media_group(self, chat_id, media, **kwargs):
+        return [await self._call("send_media_group", chat_id)]
+
+    async def edit_message_text(self, chat_id, message_id, text, reply_markup=None, **kwargs):
+        return await self._call("edit_message_text", chat_id, reply_markup)
+
+    async def delete_messages(self, chat_id, message_ids, **kwargs):
+        await self._call("delete_messages", chat_id)
+        return True
+
+    async def answer_callback_query(self, callback_query_id, text=None, show_alert=False, **kwargs):
+        await self._call("answer_callback_query")
+        return True
+
+    async def answer_inline_query(self, inline_query_id, results, cache_time=300, **kwargs):
+        await self._call("answer_inline_query")
+        self.next_offsets[inline_query_id] = kwargs.get("next_offset", "")
+        return True
+
+    async def download_media(self, file_id, in_memory=False, **kwargs):
+        await self._call("download_media")
+        return io.BytesIO(b"Ep1 https://example.com/1\nEp2 https://example.com/2\n")
+
+    def buttons(self, chat_id):
+        markup = self.last_markup.get(chat_id)
+        if markup is None:
+            return []
+        return [b.callback_data for row in markup.inline_keyboard for b in row]
+
+# ------------------------------------------------------------------- seeding
+
+TITLE_WORDS = ["shadow", "king", "moon", "dragon", "love", "lost", "empire", "river", "storm",
+               "yoddha", "secret", "night", "fire", "legend", "queen", "war", "star", "ghost"]
+
+def seed(db, categories, stories, episodes, users, rnd):
+    for name in ("categories", "stories", "episodes", "user_states", "admins", "requests",
+                 "request_groups", "pending_deletes"):
+        getattr(db, name).delete_many({})
+    db.set_owner(1)
+    # every virtual user may run the admin flow
+    db.admins.update_one({"_id": "admin_list"}, {"$set": {"admins": [1000 + i for i in range(users)]}}, upsert=True)
+    titles = []
+    for c in range(categories):
+        slug = ["fantasy", "love", "thriller", "mythology", "sci_fi", "horror"][c % 6] + ("" if c < 6 else str(c))
+        db.upsert_category(slug)
+        for _ in range(stories):
+            title = " ".join(rnd.sample(TITLE_WORDS, 3)).upper()
+            story = db.add_story(slug, title, "PHOTO_FILE_ID", f"A story about {title.lower()}.", 1)
+            titles.append((story["vision_id"], title))
+            items = [{"ep_no_start": 1, "ep_no_end": min(50, episodes), "link": "https://short/1"}]
+            items += [{"ep_no": n, "link": f"https://ep/{n}"} for n in range(51, episodes + 1)]
+            db.add_episodes(story["vision_id"], items)
+    return titles
+
+# --------------------------------------------------------------------- flows
+
+class Runner:
+    def __init__(self, handlers, client, titles, rnd):
+        self.handlers = handlers
+        self.client = client
+        self.titles = titles
+        self.rnd = rnd
+        self.samples = {}   # flow -> list of (seconds, counters); posted sends count into counters later
+        self._cbq = 0
+        self._msg = 0
+
+    async def _dispatch(self, flow, d):
+        counters = {}
+        token = _counters.set(counters)
+        try:
+            t = time.perf_counter()
+            update = updates.from_dict(d, self.client)
+            if d["kind"] == "callback":
+                await self.handlers.on_callback_query(self.client, update)
+            elif d["kind"] == "inline":
+                await self.handlers.on_inline_query(self.client, update)
+            elif (d.get("text") or "").startswith("/start"):
+                await self.handlers.cmd_start(self.client, update)
+            else:
+                await self.handlers.on_message(self.client, update)
+            elapsed = time.perf_counter() - t
+        finally:
+            _counters.reset(token)
+        self.samples.setdefault(flow, []).append((elapsed, counters))
+
+    def _user(self, uid):
+        return {"id": uid, "username": f"user{uid}", "first_name": "Bench"}
+
+    async def callback(self, flow, uid, data):
+        self._cbq += 1
+        await self._dispatch(flow, {"kind": "callback", "id": str(self._cbq), "data": data, "user": self._user(uid),
+                                    "message": {"chat_id": uid, "message_id": 1}})
+
+    async def message(self, flow, uid, text=None, photo=None, document=None):
+        self._msg += 1
+        d = {"kind": "message", "user": self._user(uid), "chat_id": uid, "message_id": self._msg, "text": text}
+        if photo:
+            d["photo_file_id"] = photo
+        if document:
+            d["document"] = document
+        await self._dispatch(flow, d)
+
+    async def explore(self, uid):
+        await self.message("explore", uid, "/start")
+        await self.callback("explore", uid, "explore:open")
+        cats = [b for b in self.client.buttons(uid) if b.startswith("explore:cat:")]
+        await self.callback("explore", uid, self.rnd.choice(cats))
+        nxt = [b for b in self.client.buttons(uid) if b.startswith("explore:pg:") and ":n:" in b]
+        if nxt:
+            await self.callback("explore", uid, nxt[0])
+
+    async def search(self, uid):
+        _, title = self.rnd.choice(self.titles)
+        query = title.lower() if self.rnd.random() < 0.5 else title[:-1]   # case / typo variants
+        await self.callback("search", uid, "search:open")
+        await self.message("search", uid, query)
+
+    async def inline(self, uid):
+        # "@bot query", then the next page if there is one
+        _, title = self.rnd.choice(self.titles)
+        query = " ".join(title.lower().split()[:self.rnd.randint(1, 2)])
+        self._cbq += 1
+        d = {"kind": "inline", "id": str(self._cbq), "query": query, "offset": "", "user": self._user(uid)}
+        await self._dispatch("inline", d)
+        next_offset = self.client.next_offsets.pop(d["id"], "")
+        if next_offset:
+            self._cbq += 1
+            page2 = dict(d, id=str(self._cbq), offset=next_offset)
+            await self._dispatch("inline", page2)
+            self.client.next_offsets.pop(page2["id"], None)
+
+    async def listen(self, uid):
+        vision, _ = self.rnd.choice(self.titles)
+        start = self.rnd.randint(1, 60)
+        await self.callback("listen", uid, f"listen:{vision}")
+        await self.message("listen", uid, self.rnd.choice([f"Ep{start}", f"Ep{start}-{start + 20}"]))
+
+    async def request(self, uid):
+        await self.callback("request", uid, "request:open")
+        _, title = self.rnd.choice(self.titles)
+        await self.message("request", uid, f"Please add {title.lower()} part 2")
+
+    async def admin(self, uid):
+        # each run adds one story, then 30 episodes in one bulk message
+        await self.message("admin", uid, "/fantasy")
+        await self.callback("admin", uid, "admin:addnew:fantasy")
+        await self.message("admin", uid, f"BENCH STORY {uid} {self.rnd.randint(0, 10**9)}")
+        await self.message("admin", uid, photo="PHOTO_FILE_ID")
+        await self.message("admin", uid, "Added by the benchmark.")
+        bulk = [b for b in self.client.buttons(uid) if b.startswith("admin:addepbulk:")]
+        if bulk:
+            await self.callback("admin", uid, bulk[0])
+            lines = "\n".join(f"Ep{n} https://ep/{n}" for n in range(1, 31))
+            await self.message("admin", uid, lines)
+
+async def drain_sends():
+    """Wait for sends handlers queued with sender.post; their calls count toward the update that queued them."""
+    import sender
+    while sender.scheduler.pending():
+        await asyncio.sleep(0.005)
+
+def costs(samples):
+    """flow -> [(seconds, db round trips, api calls)] from flow -> [(seconds, counters)]."""
+    return {flow: [(t, c.get("db", 0), c.get("api", 0)) for t, c in rows] for flow, rows in samples.items()}
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    k = min(len(values) - 1, int(round(p / 100.0 * (len(values) - 1))))
+    return values[k]
+
+def summarize(samples, wall):
+    report = {"wall_seconds": round(wall, 3), "flows": {}}
+    total = 0
+    for flow, rows in sorted(samples.items()):
+        lat = [r[0] * 1000 for r in rows]
+        total += len(rows)
+        report["flows"][flow] = {
+            "updates": len(rows),
+            "p50_ms": round(percentile(lat, 50), 3),
+            "p99_ms": round(percentile(lat, 99), 3),
+            "db_per_update": round(sum(r[1] for r in rows) / len(rows), 2),
+            "api_per_update": round(sum(r[2] for r in rows) / len(rows), 2),
+        }
+    report["updates"] = total
+    report["updates_per_second"] = round(total / wall, 1) if wall else 0.0
+    return report
+
+def print_report(report):
+    print(f"{'flow':<10}{'updates':>9}{'p50 ms':>10}{'p99 ms':>10}{'db/upd':>9}{'api/upd':>9}")
+    for flow, r in report["flows"].items():
+        print(f"{flow:<10}{r['updates']:>9}{r['p50_ms']:>10.2f}{r['p99_ms']:>10.2f}"
+              f"{r['db_per_update']:>9.2f}{r['api_per_update']:>9.2f}")
+    print(f"{report['updates']} updates in {report['wall_seconds']}s "
+          f"({report['updates_per_second']} updates/s)")
+
+def compare(report, baseline, tolerance):
+    """Return messages for flows whose p99 or per-update costs regressed beyond tolerance."""
+    problems = []
+    for flow, r in report["flows"].items():
+        b = baseline.get("flows", {}).get(flow)
+        if not b:
+            continue
+        for key in ("p99_ms", "db_per_update", "api_per_update"):
+            if b[key] and r[key] > b[key] * (1 + tolerance):
+                problems.append(f"{flow}: {key} {b[key]} -> {r[key]}")
+    return problems
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+async def run(args, handlers, catalog, titles):
+    client = FakeClient(args.api_latency / 1000.0)
+    rnd = random.Random(args.seed)
+    runner = Runner(handlers, client, titles, rnd)
+    await catalog.ensure_loaded()
+    mix = parse_mix(args.mix)
+    flows, weights = list(mix), list(mix.values())
+
+    async def user(uid):
+        for _ in range(args.iterations):
+            flow = rnd.choices(flows, weights)[0]
+            await getattr(runner, flow)(uid)
+
+    t = time.perf_counter()
+    await asyncio.gather(*(user(1000 + i) for i in range(args.users)))
+    wall = time.perf_counter() - t
+    await drain_sends()
+    return summarize(costs(runner.samples), wall)
+
+def build_parser():
+    p = argparse.ArgumentParser(description="Benchmark bot handlers offline.")
+    p.add_argument("--backend", choices=("mongomock", "mongo"), default="mongomock")
+    p.add_argument("--users", type=int, default=20, help="concurrent virtual users")
+    p.add_argument("--iterations", type=int, default=10, help="flows per user")
+    p.add_argument("--mix", default="explore=4,search=3,inline=3,listen=3,request=1,admin=1")
+    p.add_argument("--categories", type=int, default=4)
+    p.add_argument("--stories", type=int, default=25, help="stories per category")
+    p.add_argument("--episodes", type=int, default=80, help="episodes per story")
+    p.add_argument("--db-latency", type=float, default=0.0, help="injected ms per DB round trip")
+    p.add_argument("--api-latency", type=float, default=0.0, help="injected ms per Telegram API call")
+    p.add_argument("--telegram-limits", action="store_true", help="keep real send rate limits")
+    p.add_argument("--seed", type=int, default=1)
+    p.add_argument("--json", help="write the report to this file")
+    p.add_argument("--baseline", help="previous --json report; exit 1 on regressions")
+    p.add_argument("--tolerance", type=float, default=0.2, help="allowed regression vs baseline (0.2 = 20%%)")
+    return p
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    setup_env(args)
+    import db
+    import catalog
+    import migrations
+    import handlers
+    migrations.migrate(log=lambda line: None)
+    titles = seed(db, args.categories, args.stories, args.episodes, args.users, random.Random(args.seed))
+    wrap_collections(db, args.db_latency / 1000.0)
+    report = asyncio.run(run(args, handlers, catalog, titles))
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            problems = compare(report, json.load(f), args.tolerance)
+        for line in problems:
+            print("REGRESSION", line)
+        return 1 if problems else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,153 @@
+# bench_workers.py
+# Throughput of the WORKERS scale-out mode against local stand-ins. For each
+# worker count it spawns that many processes running workers.serve with
+# bench.FakeClient, routes one fixed stream of update dicts through
+# workers.Router (same user -> same worker), and reports updates/s and the
+# speedup over one worker. With mongomock every worker seeds an identical
+# private database; users are sharded, so each user's state lives in exactly
+# one of them. --backend mongo shares one local mongod instead.
+#
+#   python bench_workers.py --workers 1,2,4 --users 400 --flows 10
+#   python bench_workers.py --db-latency 2 --api-latency 20
+#
+# Speedup is bounded by the CPU cores available (printed with the results).
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import time
+import bench
+
+SLUGS = ["fantasy", "love", "thriller", "mythology", "sci_fi", "horror"]
+
+def build_updates(args):
+    """Per-user update streams (explore, search, inline and listen flows), no replies needed."""
+    rnd = random.Random(args.seed)
+    visions = [f"{SLUGS[c][:2]}{n:02d}" for c in range(args.categories) for n in range(1, args.stories + 1)]
+    seq = 0
+    stream = []
+    for i in range(args.users):
+        uid = 1000 + i
+        user = {"id": uid, "username": f"user{uid}", "first_name": "Bench"}
+
+        def cbq(data):
+            nonlocal seq
+            seq += 1
+            return {"kind": "callback", "id": str(seq), "data": data, "user": user,
+                    "message": {"chat_id": uid, "message_id": 1}}
+
+        def msg(text):
+            nonlocal seq
+            seq += 1
+            return {"kind": "message", "user": user, "chat_id": uid, "message_id": seq, "text": text}
+
+        for _ in range(args.flows):
+            flow = rnd.choice(("explore", "search", "inline", "listen"))
+            if flow == "explore":
+                stream += [cbq("explore:open"), cbq(f"explore:cat:{SLUGS[rnd.randrange(args.categories)]}")]
+            elif flow == "search":
+                stream += [cbq("search:open"), msg(" ".join(rnd.sample(bench.TITLE_WORDS, 2)))]
+            elif flow == "inline":
+                seq += 1
+                stream.append({"kind": "inline", "id": str(seq), "query": rnd.choice(bench.TITLE_WORDS),
+                               "offset": "", "user": user})
+            else:
+                start = rnd.randint(1, 60)
+                stream += [cbq(f"listen:{rnd.choice(visions)}"), msg(f"Ep{start}-{start + rnd.randint(0, 20)}")]
+    # interleave users the way live traffic arrives
+    per_user = {}
+    for d in stream:
+        per_user.setdefault(d["user"]["id"], []).append(d)
+    out = []
+    while per_user:
+        for uid in list(per_user):
+            out.append(per_user[uid].pop(0))
+            if not per_user[uid]:
+                del per_user[uid]
+    return out
+
+def _seed(args):
+    import db
+    import migrations
+    migrations.migrate(log=lambda line: None)
+    bench.seed(db, args.categories, args.stories, args.episodes, args.users, random.Random(args.seed))
+
+def worker(index, count, queue, results, args):
+    import asyncio
+    bench.setup_env(args)
+    import db
+    import catalog
+    import workers
+    if args.backend == "mongomock":
+        _seed(args)
+    bench.wrap_collections(db, args.db_latency / 1000.0)
+    client = bench.FakeClient(args.api_latency / 1000.0)
+
+    async def go():
+        await catalog.ensure_loaded()
+        results.put(("ready", index))
+        cpu = time.process_time()
+        await workers.serve(queue, client)
+        results.put(("done", index, client.calls, time.process_time() - cpu))
+
+    asyncio.run(go())
+
+def run(count, stream, args):
+    import workers
+    ctx = multiprocessing.get_context("spawn")
+    queues = [ctx.Queue() for _ in range(count)]
+    results = ctx.Queue()
+    processes = [ctx.Process(target=worker, args=(i, count, q, results, args), daemon=True)
+                 for i, q in enumerate(queues)]
+    for p in processes:
+        p.start()
+    for _ in processes:
+        results.get()   # ready
+    router = workers.Router(queues, processes)
+    routed = [0] * count
+    t = time.perf_counter()
+    for d in stream:
+        routed[workers.shard(d["user"]["id"], count)] += 1
+        router.route(d)
+    for q in queues:
+        q.put(None)
+    done = [results.get() for _ in processes]
+    wall = time.perf_counter() - t
+    for p in processes:
+        p.join()
+    return {"workers": count, "updates": len(stream), "wall": wall, "rate": len(stream) / wall,
+            "cpu": max(d[3] for d in done), "balance": max(routed) / (sum(routed) / count)}
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Benchmark throughput of WORKERS scale-out mode.")
+    p.add_argument("--workers", default="1,2,4", help="comma-separated worker counts")
+    p.add_argument("--backend", choices=("mongomock", "mongo"), default="mongomock")
+    p.add_argument("--users", type=int, default=400)
+    p.add_argument("--flows", type=int, default=10, help="flows per user")
+    p.add_argument("--categories", type=int, default=4)
+    p.add_argument("--stories", type=int, default=25, help="stories per category")
+    p.add_argument("--episodes", type=int, default=80, help="episodes per story")
+    p.add_argument("--db-latency", type=float, default=0.0, help="injected ms per DB round trip")
+    p.add_argument("--api-latency", type=float, default=0.0, help="injected ms per Telegram API call")
+    p.add_argument("--telegram-limits", action="store_true", help="keep real send rate limits")
+    p.add_argument("--seed", type=int, default=1)
+    args = p.parse_args(argv)
+    if args.categories > len(SLUGS):
+        p.error(f"--categories at most {len(SLUGS)}")
+    bench.setup_env(args)
+    if args.backend == "mongo":
+        _seed(args)
+    stream = build_updates(args)
+    print(f"{len(stream)} updates from {args.users} users, {os.cpu_count()} CPU cores")
+    print(f"{'workers':>8}{'wall s':>9}{'updates/s':>11}{'speedup':>9}{'cpu s/worker':>14}{'balance':>9}")
+    base = None
+    for count in [int(n) for n in args.workers.split(",")]:
+        r = run(count, stream, args)
+        base = base or r["rate"]
+        print(f"{count:>8}{r['wall']:>9.2f}{r['rate']:>11.1f}{r['rate'] / base:>9.2f}"
+              f"{r['cpu']:>14.2f}{r['balance']:>9.2f}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
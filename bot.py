@@ -1,33 +1,114 @@
 # bot.py
-from pyrogram import Client, filters
-import os
-import handlers
-import db
+import asyncio
+import time
+from pyrogram import Client, filters, idle
+import config
 
-BOT_TOKEN = os.environ.get("BOT_TOKEN")
-API_ID = int(os.environ.get("API_ID", "0"))
-API_HASH = os.environ.get("API_HASH")
+# fail fast with every config problem at once, before importing the rest
+config.validate()
 
-if not BOT_TOKEN or not API_ID or not API_HASH:
-    raise RuntimeError("BOT_TOKEN, API_ID and API_HASH env vars are required.")
+import handlers
+import adb
+import autodelete
+import catalog
+import inbox
+import metrics
+import migrations
+import sessions
+import snapshot
+import tracer
+import updates
+import workers
 
-app = Client("shadowfilestorebot", bot_token=BOT_TOKEN, api_id=API_ID, api_hash=API_HASH)
+app = Client("shadowfilestorebot", bot_token=config.BOT_TOKEN, api_id=config.API_ID, api_hash=config.API_HASH,
+             workers=config.HANDLER_WORKERS)
+router = None   # workers.Router when WORKERS > 1: this process only receives and routes
 
 # Wire commands/handlers
 @app.on_message(filters.private & filters.command("start"))
 async def _start(c, m):
-    await handlers.cmd_start(c, m)
+    if router:
+        return router.route(updates.to_dict(m))
+    async with tracer.recording(m):
+        with metrics.track_update("command", "start"):
+            await handlers.cmd_start(c, m)
 
 # Generic message -> pass to handlers
-@app.on_message(filters.private & (filters.text | filters.photo))
+@app.on_message(filters.private & (filters.text | filters.photo | filters.document))
 async def _on_message(c, m):
-    await handlers.on_message(c, m)
+    if router:
+        return router.route(updates.to_dict(m))
+    # label by conversation state (served from the sessions cache)
+    st = await sessions.get_state(m.from_user.id)
+    async with tracer.recording(m):
+        with metrics.track_update("message", st.get("action") or "none"):
+            await handlers.on_message(c, m)
 
 # Callback queries
 @app.on_callback_query()
 async def _on_callback(c, cq):
-    await handlers.on_callback_query(c, cq)
+    if router:
+        return router.route(updates.to_dict(cq))
+    async with tracer.recording(cq):
+        with metrics.track_update("callback", metrics.callback_route(cq.data)):
+            await handlers.on_callback_query(c, cq)
+
+# Inline mode (enable with /setinline in @BotFather)
+@app.on_inline_query()
+async def _on_inline(c, iq):
+    if router:
+        return router.route(updates.to_dict(iq))
+    async with tracer.recording(iq):
+        with metrics.track_update("inline", "search" if iq.query.strip() else "latest"):
+            await handlers.on_inline_query(c, iq)
+
+async def wait_for_schema():
+    """Readiness gate: don't take updates until migrations.py has been run (or AUTO_MIGRATE=1)."""
+    while True:
+        version = await adb.run(migrations.current_version)
+        if version >= migrations.LATEST:
+            return
+        if config.AUTO_MIGRATE:
+            await adb.run(migrations.migrate)
+            continue
+        print(f"Database schema is at version {version}, need {migrations.LATEST}: "
+              "run `python migrations.py` (or set AUTO_MIGRATE=1). Retrying in 10s.")
+        await asyncio.sleep(10)
+
+async def main():
+    global router
+    t = time.perf_counter()
+    # liveness / readiness / Prometheus metrics on PORT (workers use PORT+1...)
+    server = await metrics.start_server()
+    await wait_for_schema()
+    if config.WORKERS > 1:
+        router = workers.start(config.WORKERS)
+    async with app:
+        if router is None:
+            # warm the in-memory catalog / search index before taking updates
+            if not await snapshot.warm_start():
+                await catalog.ensure_loaded()
+            snapshot.start()
+            await autodelete.start(app)
+            await inbox.start(app)
+        metrics.ready = router.healthy() if router else True
+        watcher = asyncio.ensure_future(workers.watch(router)) if router else None
+        print(f"Bot started in {time.perf_counter() - t:.2f}s" + (f" with {config.WORKERS} workers." if router else "."))
+        await idle()
+    metrics.ready = False
+    if router is not None:
+        watcher.cancel()
+        await asyncio.get_running_loop().run_in_executor(None, router.close)
+    else:
+        await autodelete.stop()
+        await inbox.stop()
+        await sessions.flush()
+        await snapshot.stop()
+        await tracer.stop()
+    if server:
+        server.close()
 
 if __name__ == "__main__":
     print("Starting bot...")
-    app.run()
+    app.run(main())
+    adb.shutdown()
@@ -0,0 +1,61 @@
+# cache.py
+# Small in-process caches shared by the async layers (no external deps).
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+class TTLCache:
+    """
+    Bounded mapping with per-entry expiry. Oldest entries are evicted first
+    once maxsize is reached; ttl=0 disables expiry.
+    """
+    def __init__(self, maxsize=10000, ttl=0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()   # key -> (expires_at, value)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        item = self._data.get(key, _MISSING)
+        if item is _MISSING:
+            self.misses += 1
+            return default
+        expires_at, value = item
+        if expires_at and expires_at < time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key, value):
+        expires_at = time.monotonic() + self.ttl if self.ttl else 0
+        self._data[key] = (expires_at, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        item = self._data.pop(key, _MISSING)
+        return default if item is _MISSING else item[1]
+
+    def clear(self):
+        self._data.clear()
+
+    def items(self):
+        """Live (key, value) pairs, least recently used first; doesn't touch order or stats."""
+        now = time.monotonic()
+        return [(k, v) for k, (expires_at, v) in self._data.items() if not expires_at or expires_at >= now]
+
+    def hit_ratio(self):
+        total = self.hits + self.misses
+        return round(self.hits / total, 3) if total else 0.0
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __len__(self):
+        return len(self._data)
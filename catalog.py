@@ -0,0 +1,164 @@
+# catalog.py
+# In-memory view of the catalog: categories and story cards. Loaded from Mongo
+# once (at startup or on first use) and kept current by the write helpers
+# below, so read paths such as the Explore menu and search never touch the
+# database. Search results are cached per normalized query; `version` is
+# bumped by every story or episode change so cached results and rendered
+# captions / keyboards (handlers.py) keyed by it are never served stale.
+import asyncio
+import datetime
+import adb
+import config
+import metrics
+import search
+from cache import TTLCache
+
+_EPOCH = datetime.datetime(1970, 1, 1)
+# stories written by other processes can land slightly out of created_at order;
+# sync() looks back this far and skips the ones it already has
+SYNC_OVERLAP = datetime.timedelta(seconds=60)
+
+_categories = {}          # slug -> {"_id", "name", "count"}
+_categories_sorted = []   # cached get_categories() result
+_stories = {}             # vision_id -> story card (see db.STORY_CARD_FIELDS)
+_latest = None            # story cards newest first, rebuilt after add_story
+_watermark = _EPOCH       # newest created_at loaded, see sync()
+_loaded = False
+_load_lock = None
+categories_version = 0    # bumped on every category change
+version = 0               # bumped on every story / episode change
+_search_cache = TTLCache(maxsize=config.SEARCH_CACHE_SIZE)   # (version, query, limit, min_score) -> cards
+metrics.cache_gauges("search", _search_cache)
+
+def bump_version():
+    global version
+    version += 1
+
+def _categories_changed():
+    global _categories_sorted, categories_version
+    _categories_sorted = sorted(_categories.values(), key=lambda c: c.get("name", c["_id"]))
+    categories_version += 1
+
+def _card(story):
+    return {k: story.get(k) for k in ("_id", "vision_id", "category", "title", "description", "photo_file_id", "created_at")}
+
+async def ensure_loaded():
+    global _load_lock
+    if _loaded:
+        return
+    if _load_lock is None:
+        _load_lock = asyncio.Lock()
+    async with _load_lock:
+        if _loaded:
+            return
+        cats, stories = await asyncio.gather(adb.get_categories(), adb.get_all_stories())
+        load(cats, stories)
+
+def load(cats, stories):
+    """Replace the catalog with these category docs and story cards (Mongo or snapshot.py)."""
+    global _loaded, _latest, _watermark
+    _set_categories(cats)
+    _stories.clear()
+    _latest = None
+    _watermark = _EPOCH
+    search.index.clear()
+    for s in stories:
+        _add_card(s)
+    _loaded = True
+    _categories_changed()
+    bump_version()
+
+def export():
+    """(category docs, story cards) as currently loaded (snapshot.py)."""
+    return list(_categories.values()), list(_stories.values())
+
+def _set_categories(cats):
+    """Replace categories from db docs; True if anything changed."""
+    fresh = {c["_id"]: {"_id": c["_id"], "name": c.get("name", c["_id"].capitalize()), "count": c.get("count", 0)}
+             for c in cats}
+    if fresh == _categories:
+        return False
+    _categories.clear()
+    _categories.update(fresh)
+    return True
+
+def _add_card(story):
+    global _watermark
+    card = _card(story)
+    _stories[card["vision_id"]] = card
+    search.index.add(card)
+    if card.get("created_at") and card["created_at"] > _watermark:
+        _watermark = card["created_at"]
+    return card
+
+async def sync():
+    """Pick up stories and category counts written by other processes (workers.py)."""
+    global _latest
+    await ensure_loaded()
+    cats, stories = await asyncio.gather(adb.get_categories(), adb.get_stories_since(_watermark - SYNC_OVERLAP))
+    fresh = [s for s in stories if s["vision_id"] not in _stories]
+    for s in fresh:
+        _add_card(s)
+    if fresh:
+        _latest = None
+        bump_version()
+    if _set_categories(cats):
+        _categories_changed()
+    return len(fresh)
+
+async def get_categories():
+    """Categories sorted by name, same shape as db.get_categories()."""
+    await ensure_loaded()
+    return _categories_sorted
+
+async def get_story(vision_id):
+    await ensure_loaded()
+    return _stories.get(vision_id)
+
+async def latest_stories(limit):
+    """Newest story cards first (inline mode with an empty query)."""
+    global _latest
+    await ensure_loaded()
+    if _latest is None:
+        _latest = sorted(_stories.values(), key=lambda s: s.get("created_at") or _EPOCH, reverse=True)
+    return _latest[:limit]
+
+async def search_stories(query, limit=10, min_score=search.MIN_SCORE):
+    await ensure_loaded()
+    key = (version, search.normalize(query), limit, min_score)
+    hits = _search_cache.get(key)
+    if hits is None:
+        hits = search.index.search(query, limit, min_score)
+        _search_cache.set(key, hits)
+    return hits
+
+def _bump_category(slug, by=1):
+    c = _categories.get(slug)
+    if c is None:
+        c = _categories[slug] = {"_id": slug, "name": slug.capitalize(), "count": 0}
+    c["count"] = c.get("count", 0) + by
+    _categories_changed()
+
+async def upsert_category(slug, name=None):
+    await ensure_loaded()
+    res = await adb.upsert_category(slug, name)
+    _categories[slug] = {"_id": slug, "name": res.get("name", slug.capitalize()), "count": res.get("count", 0)}
+    _categories_changed()
+    return res
+
+async def gen_vision_id(category_slug, prefix=None):
+    await ensure_loaded()
+    vision = await adb.gen_vision_id(category_slug, prefix)
+    _bump_category(category_slug)
+    return vision
+
+async def add_story(category_slug, title, photo_file_id, description, created_by):
+    global _latest
+    await ensure_loaded()
+    story = await adb.add_story(category_slug, title, photo_file_id, description, created_by)
+    # db.add_story increments the category count via gen_vision_id
+    _bump_category(category_slug)
+    _add_card(story)
+    _latest = None
+    bump_version()
+    return story
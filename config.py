@@ -0,0 +1,103 @@
+# config.py
+# All environment configuration in one place. Parsing never raises at import
+# time (so tools like bench.py or migrations.py can import any module);
+# bot.py calls validate() up front and gets one error listing every problem.
+import os
+
+_errors = []
+
+def _str(name, default=None):
+    value = os.environ.get(name)
+    return value if value not in (None, "") else default
+
+def _num(cast, name, default=None):
+    value = os.environ.get(name)
+    if value in (None, ""):
+        return default
+    try:
+        return cast(value)
+    except ValueError:
+        _errors.append(f"{name} must be a number (got {value!r})")
+        return default
+
+def _int_list(name):
+    out = []
+    for part in (os.environ.get(name) or "").split(","):
+        part = part.strip()
+        if not part:
+            continue
+        try:
+            out.append(int(part))
+        except ValueError:
+            _errors.append(f"{name} must be comma-separated user ids (got {part!r})")
+    return out
+
+# Telegram
+BOT_TOKEN = _str("BOT_TOKEN")
+API_ID = _num(int, "API_ID")
+API_HASH = _str("API_HASH")
+OWNER_ID = _num(int, "OWNER_ID")
+ADMIN_IDS = frozenset(_int_list("ADMIN_IDS"))             # admins on top of the admins collection
+DB_CHANNEL_ID = _num(int, "DB_CHANNEL_ID", _num(int, "CHANNEL_ID"))  # channel where bot posts stories
+
+# MongoDB
+DATABASE_URL = _str("DATABASE_URL")                       # must include db name
+DB_POOL_SIZE = _num(int, "DB_POOL_SIZE", 8)               # adb executor threads == pymongo maxPoolSize
+AUTO_MIGRATE = _str("AUTO_MIGRATE", "0").lower() in ("1", "true", "yes")
+
+# Pyrogram handler tasks run at once; updates beyond this wait (Pyrogram's default is 5)
+HANDLER_WORKERS = _num(int, "HANDLER_WORKERS", 32)
+
+# Caches
+SESSION_TTL_SECONDS = _num(int, "SESSION_TTL_SECONDS", 300)
+STATE_CACHE_SIZE = _num(int, "STATE_CACHE_SIZE", 10000)
+STATE_FLUSH_SECONDS = _num(float, "STATE_FLUSH_SECONDS", 5.0)   # 0 = write-through
+ADMIN_CACHE_SECONDS = _num(float, "ADMIN_CACHE_SECONDS", 60.0)
+EPISODE_CACHE_STORIES = _num(int, "EPISODE_CACHE_STORIES", 2000)
+SEARCH_CACHE_SIZE = _num(int, "SEARCH_CACHE_SIZE", 5000)     # normalized query -> results
+RENDER_CACHE_SIZE = _num(int, "RENDER_CACHE_SIZE", 5000)     # per-story captions / keyboards
+
+# UI / outbound
+EXPLORE_PAGE_SIZE = min(_num(int, "EXPLORE_PAGE_SIZE", 10), 10)  # media group max is 10
+INLINE_PAGE_SIZE = min(_num(int, "INLINE_PAGE_SIZE", 20), 50)   # Telegram allows 50 results per answer
+INLINE_CACHE_SECONDS = _num(int, "INLINE_CACHE_SECONDS", 300)    # server-side cache of inline answers
+SEND_GLOBAL_RATE = _num(float, "SEND_GLOBAL_RATE", 30.0)   # msgs/second bot-wide
+SEND_CHAT_RATE = _num(float, "SEND_CHAT_RATE", 1.0)        # msgs/second per chat
+SEND_CHAT_BURST = _num(float, "SEND_CHAT_BURST", 3.0)
+SEND_MAX_FLOOD_RETRIES = _num(int, "SEND_MAX_FLOOD_RETRIES", 3)
+
+# Delivered photos / links are deleted from user chats after this long (0 = keep)
+AUTO_DELETE_MINUTES = _num(float, "AUTO_DELETE_MINUTES", 0.0)
+
+# Request & Comment: asks are queued and sent to owner/admins as one digest
+REQUEST_DIGEST_MINUTES = _num(float, "REQUEST_DIGEST_MINUTES", 60.0)
+REQUEST_FLUSH_SECONDS = _num(float, "REQUEST_FLUSH_SECONDS", 5.0)
+
+# Warm start: catalog + episode map snapshot ("" = off), rewritten every SNAPSHOT_SECONDS
+SNAPSHOT_PATH = _str("SNAPSHOT_PATH", "")
+SNAPSHOT_SECONDS = _num(float, "SNAPSHOT_SECONDS", 600.0)
+
+# Scale-out: WORKERS > 1 runs handlers in that many processes (see workers.py)
+WORKERS = _num(int, "WORKERS", 1)
+WORKER_SYNC_SECONDS = _num(float, "WORKER_SYNC_SECONDS", 30.0)   # catalog / request re-sync between workers
+
+# Update traces for replay.py: anonymized, append-only ("" = off)
+TRACE_PATH = _str("TRACE_PATH", "")
+TRACE_SAMPLE = _num(float, "TRACE_SAMPLE", 1.0)      # fraction of users recorded
+TRACE_MAX_MB = _num(float, "TRACE_MAX_MB", 512.0)    # recording stops past this file size
+
+# Ops
+PORT = _num(int, "PORT", 0)                                # health/metrics server, 0 = off
+
+BOT_REQUIRED = ("BOT_TOKEN", "API_ID", "API_HASH", "DATABASE_URL", "OWNER_ID")
+
+def validate(required=BOT_REQUIRED):
+    """Raise one RuntimeError naming every missing or malformed setting."""
+    problems = list(_errors)
+    for name in required:
+        if globals().get(name) in (None, ""):
+            problems.append(f"{name} is required")
+    if DATABASE_URL and "DATABASE_URL" in required and "/" not in DATABASE_URL.split("://", 1)[-1]:
+        problems.append("DATABASE_URL must include the database name")
+    if problems:
+        raise RuntimeError("Invalid configuration:\n  " + "\n  ".join(problems))
@@ -1,41 +1,57 @@
 # db.py
 # MongoDB helper functions and schema-level helpers
-from pymongo import MongoClient, ReturnDocument, ASCENDING, TEXT
-import os
-import re
+from pymongo import MongoClient, ReturnDocument, ASCENDING, DESCENDING, ReplaceOne, DeleteOne, UpdateOne
+from pymongo.errors import BulkWriteError
+from bson import ObjectId
 import datetime
+import threading
+import config
+import metrics
 
-DATABASE_URL = os.environ.get("DATABASE_URL")  # must include db name
-if not DATABASE_URL:
-    raise RuntimeError("DATABASE_URL is required (include DB name in URL).")
+# The client is created on first use, not at import: importing db (or anything
+# that imports it) costs nothing, and index builds live in migrations.py.
+_client = None
+_database = None
+_connect_lock = threading.Lock()
 
-client = MongoClient(DATABASE_URL)
-db = client.get_default_database()
+def connect(client=None):
+    """Return the database, creating the MongoClient on first call (or adopting client)."""
+    global _client, _database
+    if _database is not None and client is None:
+        return _database
+    with _connect_lock:
+        if client is not None:
+            _client, _database = client, client.get_default_database()
+        elif _database is None:
+            if not config.DATABASE_URL:
+                raise RuntimeError("DATABASE_URL is required (include DB name in URL).")
+            # pool sized to the adb.py executor so every worker thread can hold a socket
+            _client = MongoClient(config.DATABASE_URL, maxPoolSize=config.DB_POOL_SIZE,
+                                  event_listeners=[metrics.MongoCommandTimer()])
+            _database = _client.get_default_database()
+    return _database
 
-# Collections
-categories = db.categories            # { _id: "fantasy", name: "Fantasy", count: 0 }
-stories = db.stories                  # story docs (vision_id unique)
-episodes = db.episodes                # episodes: either single ep or range (shortlink)
-user_states = db.user_states          # ephemeral state per admin/user
-admins = db.admins                    # admin list doc { _id: "admin_list", owner_id:int, admins:[] }
-requests = db.requests                # forwarded user requests
-
-# Ensure indexes on startup
-def ensure_indexes():
-    # stories: unique vision_id
-    stories.create_index([("vision_id", ASCENDING)], unique=True)
-    # text index for search (title + description)
-    try:
-        stories.create_index([("title", TEXT), ("description", TEXT)], name="text_title_description", default_language="english")
-    except Exception:
-        # ignore if index exists or earlier mongo versions differ
-        pass
-    # episodes lookup
-    episodes.create_index([("story_vision_id", ASCENDING), ("ep_no", ASCENDING)], unique=True, sparse=True)
-    # episodes range index for shortlinks
-    episodes.create_index([("story_vision_id", ASCENDING), ("ep_no_start", ASCENDING), ("ep_no_end", ASCENDING)])
+def get_client():
+    connect()
+    return _client
+
+class _LazyCollection:
+    """Module-level collection handle that connects on first use."""
+    def __init__(self, name):
+        self.name = name
 
-ensure_indexes()
+    def __getattr__(self, attr):
+        return getattr(connect()[self.name], attr)
+
+# Collections
+categories = _LazyCollection("categories")    # { _id: "fantasy", name: "Fantasy", count: 0 }
+stories = _LazyCollection("stories")          # story docs (vision_id unique)
+episodes = _LazyCollection("episodes")        # episodes: either single ep or range (shortlink)
+user_states = _LazyCollection("user_states")  # ephemeral state per admin/user
+admins = _LazyCollection("admins")            # admin list doc { _id: "admin_list", owner_id:int, admins:[] }
+requests = _LazyCollection("requests")        # every Request & Comment message, as sent
+request_groups = _LazyCollection("request_groups")  # duplicate requests collapsed, see inbox.py
+pending_deletes = _LazyCollection("pending_deletes")  # { chat_id, message_ids:[], due_at } see autodelete.py
 
 # Helpers
 
@@ -72,6 +88,24 @@ def gen_vision_id(category_slug, prefix=None):
     vision = f"{prefix}{num:02d}"
     return vision
 
+def reserve_vision_ids(category_slug, n, prefix=None):
+    """
+    Reserve n consecutive vision ids with a single $inc (bulk import).
+    Same numbering as gen_vision_id.
+    """
+    if n <= 0:
+        return []
+    if not prefix:
+        prefix = category_slug[:2].lower()
+    res = categories.find_one_and_update(
+        {"_id": category_slug},
+        {"$inc": {"count": n}, "$setOnInsert": {"name": category_slug.capitalize()}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    last = res.get("count", n)
+    return [f"{prefix}{num:02d}" for num in range(last - n + 1, last + 1)]
+
 def add_story(category_slug, title, photo_file_id, description, created_by):
     """
     Create story, generate vision id, post and return story doc.
@@ -93,22 +127,42 @@ def add_story(category_slug, title, photo_file_id, description, created_by):
 def get_story_by_vision(vision_id):
     return stories.find_one({"vision_id": vision_id})
 
-def search_stories_text(query, limit=10):
+# fields needed to render a story card
+STORY_CARD_FIELDS = {"vision_id": 1, "title": 1, "description": 1, "photo_file_id": 1, "created_at": 1}
+
+def get_stories_page(slug, cursor=None, direction="next", limit=10):
     """
-    Prefer text index search; fallback to regex search.
+    Keyset page of a category's stories, newest first, ordered by (created_at, _id).
+    cursor is the (created_at, _id) of the last story shown (direction="next")
+    or the first story shown (direction="prev"). Returns (docs, has_more).
     """
-    if not query:
-        return []
-    try:
-        cursor = stories.find(
-            {"$text": {"$search": query}},
-            {"score": {"$meta": "textScore"}, "vision_id": 1, "title": 1, "description": 1, "photo_file_id": 1}
-        ).sort([("score", {"$meta": "textScore"})]).limit(limit)
-        return list(cursor)
-    except Exception:
-        regex = {"$regex": re.escape(query), "$options": "i"}
-        cursor = stories.find({"$or": [{"title": regex}, {"description": regex}]}, {"vision_id":1,"title":1,"description":1,"photo_file_id":1}).limit(limit)
-        return list(cursor)
+    query = {"category": slug}
+    if direction == "prev":
+        op, order = "$gt", ASCENDING
+    else:
+        op, order = "$lt", DESCENDING
+    if cursor:
+        created_at, oid = cursor
+        query["$or"] = [
+            {"created_at": {op: created_at}},
+            {"created_at": created_at, "_id": {op: oid}},
+        ]
+    docs = list(stories.find(query, STORY_CARD_FIELDS)
+                .sort([("created_at", order), ("_id", order)])
+                .limit(limit + 1))
+    has_more = len(docs) > limit
+    docs = docs[:limit]
+    if direction == "prev":
+        docs.reverse()
+    return docs, has_more
+
+def get_all_stories():
+    """Every story card (plus category), used to build the in-memory catalog."""
+    return list(stories.find({}, dict(STORY_CARD_FIELDS, category=1)))
+
+def get_stories_since(created_at):
+    """Story cards created at or after created_at (catalog re-sync across processes)."""
+    return list(stories.find({"created_at": {"$gte": created_at}}, dict(STORY_CARD_FIELDS, category=1)))
 
 def add_episode(vision_id, ep_no=None, link=None, short=False, ep_no_start=None, ep_no_end=None):
     """
@@ -129,6 +183,52 @@ def add_episode(vision_id, ep_no=None, link=None, short=False, ep_no_start=None,
     episodes.insert_one(doc)
     return doc
 
+def add_episodes(vision_id, items):
+    """
+    Insert many episodes in one unordered insert_many. items are dicts with
+    link and either ep_no or ep_no_start/ep_no_end. Rows rejected by the unique
+    (story_vision_id, ep_no) index count as duplicates.
+    Returns (inserted_docs, duplicate_count).
+    """
+    now = datetime.datetime.utcnow()
+    docs = []
+    for it in items:
+        doc = {"story_vision_id": vision_id, "link": it["link"], "added_at": now}
+        if it.get("ep_no") is not None:
+            doc["ep_no"] = int(it["ep_no"])
+            doc["short"] = False
+        else:
+            doc["ep_no_start"] = int(it["ep_no_start"])
+            doc["ep_no_end"] = int(it["ep_no_end"])
+            doc["short"] = True
+        docs.append(doc)
+    if not docs:
+        return [], 0
+    try:
+        episodes.insert_many(docs, ordered=False)
+    except BulkWriteError as e:
+        errors = e.details.get("writeErrors", [])
+        if any(err.get("code") != 11000 for err in errors):
+            raise
+        failed = {err["index"] for err in errors}
+        return [d for i, d in enumerate(docs) if i not in failed], len(failed)
+    return docs, 0
+
+def get_episodes_since(added_at):
+    """Episodes of every story added at or after added_at (snapshot reconcile)."""
+    return list(episodes.find({"added_at": {"$gte": added_at}},
+                              {"_id": 0, "story_vision_id": 1, "ep_no": 1, "ep_no_start": 1, "ep_no_end": 1, "link": 1}))
+
+def get_episodes_for(vision_ids):
+    """Episodes of many stories in one streaming query (snapshot.py --write)."""
+    return episodes.find({"story_vision_id": {"$in": list(vision_ids)}},
+                         {"_id": 0, "story_vision_id": 1, "ep_no": 1, "ep_no_start": 1, "ep_no_end": 1, "link": 1})
+
+def get_episodes(vision_id):
+    """All single episodes and shortlink ranges of a story."""
+    return list(episodes.find({"story_vision_id": vision_id},
+                              {"_id": 0, "ep_no": 1, "ep_no_start": 1, "ep_no_end": 1, "link": 1, "short": 1}))
+
 def find_episode_single(vision_id, ep_no):
     return episodes.find_one({"story_vision_id": vision_id, "ep_no": int(ep_no)})
 
@@ -141,15 +241,91 @@ def find_shortlink_for_range(vision_id, start, end):
         "ep_no_end": {"$gte": int(end)}
     })
 
+def add_requests(docs):
+    if docs:
+        requests.insert_many(docs, ordered=False)
+
+def apply_request_deltas(deltas, max_users=20):
+    """
+    Add asks to request groups in one round trip; safe with several processes
+    writing the same group. deltas: [(group_doc, count, user_ids, last_at)],
+    group_doc supplies the fields of a group created by this write.
+    """
+    ops = []
+    for group, count, user_ids, last_at in deltas:
+        ops.append(UpdateOne({"_id": group["_id"]}, {
+            "$setOnInsert": dict({k: group.get(k) for k in ("key", "text", "vision_id", "first_at")}, status="open"),
+            "$inc": {"count": count, "new": count},
+            "$max": {"last_at": last_at},
+            "$push": {"users": {"$each": list(user_ids), "$slice": max_users}},
+        }, upsert=True))
+    if ops:
+        request_groups.bulk_write(ops, ordered=False)
+
+def get_open_request_groups():
+    return list(request_groups.find({"status": "open"}, {"key": 1, "text": 1, "vision_id": 1, "count": 1,
+                                                             "users": 1, "first_at": 1}))
+
+def get_request_groups_page(skip, limit):
+    """Open groups, most asked first, plus the total number of open groups."""
+    docs = list(request_groups.find({"status": "open"}).sort([("count", -1), ("_id", 1)]).skip(skip).limit(limit))
+    return docs, request_groups.count_documents({"status": "open"})
+
+def get_request_digest():
+    return list(request_groups.find({"status": "open", "new": {"$gt": 0}}))
+
+def ack_request_digest(groups):
+    """Subtract what a digest reported, keeping asks that arrived meanwhile."""
+    ops = [UpdateOne({"_id": g["_id"]}, {"$inc": {"new": -g["new"]}}) for g in groups]
+    if ops:
+        request_groups.bulk_write(ops, ordered=False)
+
+def close_request_group(group_id):
+    res = request_groups.update_one({"_id": group_id, "status": "open"},
+                                    {"$set": {"status": "done", "closed_at": datetime.datetime.utcnow()}})
+    return res.modified_count > 0
+
 # State helpers
 def set_state(user_id, state_dict):
     state = {"_id": user_id}
     state.update(state_dict)
+    state["updated_at"] = datetime.datetime.utcnow()
     user_states.replace_one({"_id": user_id}, state, upsert=True)
 def get_state(user_id):
     return user_states.find_one({"_id": user_id}) or {}
 def clear_state(user_id):
     user_states.delete_one({"_id": user_id})
+def flush_states(upserts, deletes):
+    """
+    Persist many state changes in one round trip.
+    upserts: {user_id: state_dict}, deletes: iterable of user_ids.
+    """
+    now = datetime.datetime.utcnow()
+    ops = []
+    for user_id, state_dict in upserts.items():
+        state = {"_id": user_id}
+        state.update(state_dict)
+        state["updated_at"] = now
+        ops.append(ReplaceOne({"_id": user_id}, state, upsert=True))
+    for user_id in deletes:
+        ops.append(DeleteOne({"_id": user_id}))
+    if ops:
+        user_states.bulk_write(ops, ordered=False)
+
+# Auto-delete helpers
+def new_id():
+    return ObjectId()
+
+def add_pending_deletes(docs):
+    if docs:
+        pending_deletes.insert_many(docs, ordered=False)
+
+def get_pending_deletes():
+    return list(pending_deletes.find({}).sort("due_at", 1))
+
+def remove_pending_deletes(ids):
+    if ids:
+        pending_deletes.delete_many({"_id": {"$in": list(ids)}})
 
 # Admin list helpers
 def get_admins_doc():
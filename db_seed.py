@@ -0,0 +1,172 @@
+# db_seed.py
+# Bulk catalog importer. Streams stories and episodes from JSONL or CSV files
+# and writes them in large unordered batches.
+#
+#   python db_seed.py --stories stories.jsonl --episodes episodes.csv
+#
+# Story rows:   category, title, photo_file_id, description [, created_by]
+# Episode rows: link, either ep_no or ep_no_start + ep_no_end, and the story as
+#               vision_id or category + title
+#
+# Re-running the same files is safe: stories already present (same category
+# and title) are skipped before any vision id is reserved, and episodes are
+# upserted on (vision_id, ep_no) / (vision_id, start, end).
+import argparse
+import csv
+import datetime
+import itertools
+import json
+import sys
+import time
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+import config
+import db
+
+BATCH_SIZE = 1000
+
+def read_rows(path):
+    """Yield dict rows from a .jsonl / .json-lines or .csv file without loading it whole."""
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.lower().endswith(".csv"):
+            for row in csv.DictReader(f):
+                yield {k: v for k, v in row.items() if v not in (None, "")}
+        else:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+
+def batches(rows, size=BATCH_SIZE):
+    it = iter(rows)
+    while True:
+        chunk = list(itertools.islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+def _insert_ignoring_duplicates(collection, docs):
+    """insert_many(ordered=False); duplicate key errors (a retried import) are skipped."""
+    if not docs:
+        return 0
+    try:
+        return len(collection.insert_many(docs, ordered=False).inserted_ids)
+    except BulkWriteError as e:
+        fatal = [err for err in e.details.get("writeErrors", []) if err.get("code") != 11000]
+        if fatal:
+            raise
+        return e.details.get("nInserted", 0)
+
+def import_stories(path, created_by=None):
+    stats = {"inserted": 0, "skipped": 0, "invalid": 0}
+    for chunk in batches(read_rows(path)):
+        by_category = {}
+        for row in chunk:
+            if not row.get("category") or not row.get("title") or not row.get("photo_file_id"):
+                stats["invalid"] += 1
+                continue
+            by_category.setdefault(row["category"], []).append(row)
+        docs = []
+        for slug, rows in by_category.items():
+            titles = [r["title"] for r in rows]
+            existing = {d["title"] for d in db.stories.find({"category": slug, "title": {"$in": titles}}, {"title": 1})}
+            fresh, seen = [], set()
+            for r in rows:
+                if r["title"] in existing or r["title"] in seen:
+                    stats["skipped"] += 1
+                    continue
+                seen.add(r["title"])
+                fresh.append(r)
+            # one $inc reserves the whole block for this category
+            visions = db.reserve_vision_ids(slug, len(fresh))
+            now = datetime.datetime.utcnow()
+            for r, vision in zip(fresh, visions):
+                docs.append({
+                    "vision_id": vision,
+                    "category": slug,
+                    "title": r["title"],
+                    "photo_file_id": r["photo_file_id"],
+                    "description": r.get("description", ""),
+                    "created_by": r.get("created_by", created_by),
+                    "created_at": now,
+                })
+        inserted = _insert_ignoring_duplicates(db.stories, docs)
+        stats["inserted"] += inserted
+        stats["skipped"] += len(docs) - inserted
+    return stats
+
+def _episode_op(row):
+    vision = row["vision_id"]
+    doc = {"story_vision_id": vision, "link": row["link"], "added_at": datetime.datetime.utcnow()}
+    if row.get("ep_no") not in (None, ""):
+        doc["ep_no"] = int(row["ep_no"])
+        doc["short"] = False
+        key = {"story_vision_id": vision, "ep_no": doc["ep_no"]}
+    else:
+        doc["ep_no_start"] = int(row["ep_no_start"])
+        doc["ep_no_end"] = int(row["ep_no_end"])
+        doc["short"] = True
+        key = {"story_vision_id": vision, "ep_no_start": doc["ep_no_start"], "ep_no_end": doc["ep_no_end"]}
+    return UpdateOne(key, {"$setOnInsert": doc}, upsert=True)
+
+def _resolve_visions(rows):
+    """Fill in vision_id for rows that name their story by category + title (one query per batch)."""
+    wanted = {(r["category"], r["title"]) for r in rows
+              if not r.get("vision_id") and r.get("category") and r.get("title")}
+    if not wanted:
+        return
+    found = {}
+    query = {"$or": [{"category": c, "title": t} for c, t in wanted]}
+    for d in db.stories.find(query, {"category": 1, "title": 1, "vision_id": 1}):
+        found[(d["category"], d["title"])] = d["vision_id"]
+    for r in rows:
+        if not r.get("vision_id"):
+            r["vision_id"] = found.get((r.get("category"), r.get("title")))
+
+def import_episodes(path):
+    stats = {"inserted": 0, "skipped": 0, "invalid": 0}
+    for chunk in batches(read_rows(path)):
+        _resolve_visions(chunk)
+        ops = []
+        for row in chunk:
+            try:
+                if not row.get("vision_id") or not row.get("link"):
+                    raise ValueError("story and link are required")
+                ops.append(_episode_op(row))
+            except (KeyError, ValueError):
+                stats["invalid"] += 1
+        if not ops:
+            continue
+        try:
+            res = db.episodes.bulk_write(ops, ordered=False)
+            upserted = res.upserted_count
+        except BulkWriteError as e:
+            if any(err.get("code") != 11000 for err in e.details.get("writeErrors", [])):
+                raise
+            upserted = e.details.get("nUpserted", 0)
+        stats["inserted"] += upserted
+        stats["skipped"] += len(ops) - upserted
+    return stats
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Bulk import stories / episodes into MongoDB.")
+    p.add_argument("--stories", help="JSONL or CSV file of stories")
+    p.add_argument("--episodes", help="JSONL or CSV file of episodes")
+    p.add_argument("--created-by", type=int, default=None, help="user id recorded on imported stories")
+    args = p.parse_args(argv)
+    config.validate(required=("DATABASE_URL",))
+    if not args.stories and not args.episodes:
+        p.error("nothing to import: pass --stories and/or --episodes")
+    # stories first so episode rows can reference freshly reserved vision ids
+    if args.stories:
+        t = time.perf_counter()
+        stats = import_stories(args.stories, args.created_by)
+        print(f"stories: {stats} in {time.perf_counter() - t:.1f}s")
+    if args.episodes:
+        t = time.perf_counter()
+        stats = import_episodes(args.episodes)
+        print(f"episodes: {stats} in {time.perf_counter() - t:.1f}s")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,174 @@
+# epindex.py
+# Per-story episode interval index. Single episodes (ep_no) and shortlinks
+# (ep_no_start..ep_no_end) are both stored as intervals; a request EpX-Y is
+# answered with the fewest links that cover it (greedy max-reach, which is
+# optimal for interval cover), plus the episodes nobody has uploaded yet.
+# Maps are loaded per vision_id on first use and kept current by add_episode.
+import bisect
+import datetime
+import adb
+import catalog
+import config
+import metrics
+from cache import TTLCache
+
+class EpisodeMap:
+    def __init__(self, docs=()):
+        self._intervals = []   # (start, end, link), sorted by start
+        self.loaded_at = None  # when docs were read from Mongo; later adds from other processes are missing
+        for d in docs:
+            self._intervals.append(_interval(d))
+        self._intervals.sort(key=lambda iv: (iv[0], -iv[1]))
+        self._rebuild()
+
+    def _rebuild(self):
+        # _starts[i] = start of interval i; _reach[i] = index of the interval
+        # with the furthest end among intervals 0..i (prefix max)
+        self._starts = [iv[0] for iv in self._intervals]
+        self._reach = []
+        best = None
+        for i, iv in enumerate(self._intervals):
+            if best is None or iv[1] > self._intervals[best][1]:
+                best = i
+            self._reach.append(best)
+
+    @classmethod
+    def from_intervals(cls, intervals, loaded_at=None):
+        m = cls()
+        m.loaded_at = loaded_at
+        m._intervals = sorted((tuple(iv) for iv in intervals), key=lambda iv: (iv[0], -iv[1]))
+        m._rebuild()
+        return m
+
+    def intervals(self):
+        return list(self._intervals)
+
+    def __len__(self):
+        return len(self._intervals)
+
+    def add(self, doc):
+        iv = _interval(doc)
+        i = bisect.bisect_right(self._starts, iv[0])
+        self._intervals.insert(i, iv)
+        self._rebuild()
+
+    def add_many(self, docs):
+        self._intervals.extend(_interval(d) for d in docs)
+        self._intervals.sort(key=lambda iv: (iv[0], -iv[1]))
+        self._rebuild()
+
+    def merge(self, docs):
+        """add_many, skipping intervals already present (replayed snapshot deltas)."""
+        known = set(self._intervals)
+        fresh = [d for d in docs if _interval(d) not in known]
+        if fresh:
+            self.add_many(fresh)
+
+    def _furthest(self, ep):
+        """Interval starting at or before ep that reaches furthest, if it covers ep."""
+        i = bisect.bisect_right(self._starts, ep) - 1
+        if i < 0:
+            return None
+        iv = self._intervals[self._reach[i]]
+        return iv if iv[1] >= ep else None
+
+    def _exact(self, start, end):
+        """Interval spanning exactly start..end (a direct link for Ep5 rather than the Ep1-50 shortlink)."""
+        i = bisect.bisect_left(self._starts, start)
+        while i < len(self._intervals) and self._intervals[i][0] == start:
+            if self._intervals[i][1] == end:
+                return self._intervals[i]
+            i += 1
+        return None
+
+    def cover(self, start, end):
+        """
+        Minimal list of (start, end, link) covering start..end, and the list of
+        missing (start, end) gaps.
+        """
+        parts, missing = [], []
+        ep = start
+        while ep <= end:
+            iv = self._furthest(ep)
+            if iv is not None and iv[1] >= end:
+                # any interval finishing the request will do; an exact one wins ties
+                iv = self._exact(ep, end) or iv
+            if iv is not None:
+                parts.append(iv)
+                ep = iv[1] + 1
+                continue
+            # gap: jump to the next interval start (or past the end)
+            i = bisect.bisect_right(self._starts, ep)
+            gap_end = min(end, self._starts[i] - 1) if i < len(self._starts) else end
+            missing.append((ep, gap_end))
+            ep = gap_end + 1
+        return parts, missing
+
+def _interval(doc):
+    if doc.get("ep_no") is not None:
+        return (int(doc["ep_no"]), int(doc["ep_no"]), doc["link"])
+    return (int(doc["ep_no_start"]), int(doc["ep_no_end"]), doc["link"])
+
+_maps = TTLCache(maxsize=config.EPISODE_CACHE_STORIES)
+metrics.cache_gauges("episodes", _maps)
+
+def expire_after(seconds):
+    """Reload maps after this long, for processes that don't see each other's add_episode."""
+    _maps.ttl = seconds
+
+async def get_map(vision_id):
+    m = _maps.get(vision_id)
+    if m is None:
+        loaded_at = datetime.datetime.utcnow()
+        m = EpisodeMap(await adb.get_episodes(vision_id))
+        m.loaded_at = loaded_at
+        _maps.set(vision_id, m)
+    return m
+
+def export_maps():
+    """{vision_id: ([(start, end, link), ...], loaded_at)} for every cached map (snapshot.py)."""
+    return {vision: (m.intervals(), m.loaded_at) for vision, m in _maps.items()}
+
+def load_maps(maps):
+    for vision, (intervals, loaded_at) in maps.items():
+        _maps.set(vision, EpisodeMap.from_intervals(intervals, loaded_at))
+
+def merge_episodes(docs, fetched_at=None):
+    """
+    Fold episode docs written since a snapshot into the maps that are loaded.
+    With fetched_at, docs cover every map since its loaded_at, so each map is
+    now current as of fetched_at.
+    """
+    by_story = {}
+    for d in docs:
+        by_story.setdefault(d["story_vision_id"], []).append(d)
+    cached = dict(_maps.items())
+    for vision, story_docs in by_story.items():
+        if vision in cached:
+            cached[vision].merge(story_docs)
+    if fetched_at is not None:
+        for m in cached.values():
+            m.loaded_at = fetched_at
+
+async def cover(vision_id, start, end):
+    m = await get_map(vision_id)
+    return m.cover(start, end)
+
+async def add_episode(vision_id, ep_no=None, link=None, short=False, ep_no_start=None, ep_no_end=None):
+    doc = await adb.add_episode(vision_id, ep_no=ep_no, link=link, short=short,
+                                ep_no_start=ep_no_start, ep_no_end=ep_no_end)
+    m = _maps.get(vision_id)
+    if m is not None:
+        m.add(doc)
+    catalog.bump_version()
+    return doc
+
+async def add_episodes(vision_id, items):
+    """Bulk insert; returns (inserted_docs, duplicate_count) like db.add_episodes."""
+    docs, dups = await adb.add_episodes(vision_id, items)
+    m = _maps.get(vision_id)
+    if m is not None and docs:
+        m.add_many(docs)
+    if docs:
+        catalog.bump_version()
+    return docs, dups
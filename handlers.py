@@ -1,13 +1,24 @@
 # handlers.py
-# All bot handlers (callbacks, message flows). Uses db.py helpers.
+# All bot handlers (callbacks, message flows). Uses the awaitable adb.py helpers.
 from pyrogram import filters
-from pyrogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+from pyrogram.types import InlineKeyboardButton, InlineKeyboardMarkup, InputMediaPhoto, InlineQueryResultCachedPhoto
+from bson import ObjectId
+import datetime
 import re
-import db
-import os
+import adb
+import authz
+import autodelete
+import catalog
+import config
+import epindex
+import inbox
+import metrics
+import sender
+import sessions
+from cache import TTLCache
 
-OWNER_ID = int(os.environ["OWNER_ID"])
-DB_CHANNEL_ID = int(os.environ["DB_CHANNEL_ID"])  # channel where bot posts stories
+OWNER_ID = config.OWNER_ID
+DB_CHANNEL_ID = config.DB_CHANNEL_ID  # channel where bot posts stories
 
 def make_kb(button_rows):
     rows = []
@@ -18,13 +29,221 @@ def make_kb(button_rows):
         rows.append(r)
     return InlineKeyboardMarkup(rows)
 
+# Per-story captions / keyboards / inline results are the same for every user;
+# keys carry catalog.version so a story or episode change renders them afresh
+_rendered = TTLCache(maxsize=config.RENDER_CACHE_SIZE)
+metrics.cache_gauges("render", _rendered)
+
+def _render(kind, story, build):
+    key = (kind, catalog.version, story["vision_id"])
+    value = _rendered.get(key)
+    if value is None:
+        value = build()
+        _rendered.set(key, value)
+    return value
+
+def story_caption(s):
+    return _render("caption", s, lambda: f"{s['vision_id']} - {s.get('title')}\n\n{s.get('description') or ''}"[:1024])
+
+def story_kb(s):
+    """Listen / Back keyboard under a search result."""
+    return _render("kb", s, lambda: make_kb([[("Listen", f"listen:{s['vision_id']}")], [("⟵ Back", "start:menu")]]))
+
+def inline_result(s, username):
+    def build():
+        kb = None
+        if username:
+            # inline messages have no chat for callbacks; deep link into the bot instead
+            kb = InlineKeyboardMarkup([[InlineKeyboardButton("Listen", url=f"https://t.me/{username}?start={s['vision_id']}")]])
+        return InlineQueryResultCachedPhoto(
+            photo_file_id=s["photo_file_id"], id=s["vision_id"], title=f"{s['vision_id']} - {s['title']}",
+            description=(s.get("description") or "")[:100], caption=story_caption(s), reply_markup=kb)
+    return _render(f"inline:{username}", s, build)
+
+def split_message(lines, limit=4096):
+    """Join lines into as few messages as Telegram's length limit allows."""
+    chunks, cur = [], ""
+    for line in lines:
+        if cur and len(cur) + 1 + len(line) > limit:
+            chunks.append(cur)
+            cur = line
+        else:
+            cur = f"{cur}\n{line}" if cur else line
+    if cur:
+        chunks.append(cur)
+    return chunks
+
+# Bulk episode lines: "Ep12 https://..." or "Ep1-50 https://short..."
+_EP_LINE = re.compile(r"^ep(\d+)(?:\s*-\s*(\d+))?[\s:]+(https?://\S+)$", re.IGNORECASE)
+MAX_BULK_FILE_BYTES = 1024 * 1024
+
+def parse_episode_lines(text):
+    """Return (items, invalid_lines, duplicates_in_text) for a multi-line episode list."""
+    items, invalid, seen, dups = [], [], set(), 0
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        m = _EP_LINE.match(line)
+        if not m or (m.group(2) and int(m.group(2)) < int(m.group(1))):
+            invalid.append(line)
+            continue
+        if m.group(2):
+            key = (int(m.group(1)), int(m.group(2)))
+            item = {"ep_no_start": key[0], "ep_no_end": key[1], "link": m.group(3)}
+        else:
+            key = int(m.group(1))
+            item = {"ep_no": key, "link": m.group(3)}
+        if key in seen:
+            dups += 1
+            continue
+        seen.add(key)
+        items.append(item)
+    return items, invalid, dups
+
+async def add_episodes_bulk(client, message, vision):
+    """Validate every line of a message / .txt upload and insert them in one bulk write."""
+    text = message.text or message.caption or ""
+    if message.document:
+        doc = message.document
+        is_text = (getattr(doc, "mime_type", None) or "").startswith("text/") or \
+            (doc.file_name or "").lower().endswith(".txt")
+        if not is_text:
+            await sender.send(message.chat.id, message.reply_text,
+                              "Send episode lines as a .txt file (one EpN <url> or EpX-Y <shortlink> per line).")
+            return
+        if (message.document.file_size or 0) > MAX_BULK_FILE_BYTES:
+            await sender.send(message.chat.id, message.reply_text, "File too large (max 1 MB of episode lines).")
+            return
+        data = await client.download_media(message.document.file_id, in_memory=True)
+        text = bytes(data.getbuffer()).decode("utf-8", errors="replace")
+    items, invalid, dups = parse_episode_lines(text)
+    docs, db_dups = await epindex.add_episodes(vision, items)
+    report = [f"{vision}: {len(docs)} inserted, {dups + db_dups} duplicate, {len(invalid)} invalid."]
+    if invalid:
+        report.append("Invalid lines (use EpN <url> or EpX-Y <shortlink>):")
+        report.extend(invalid[:20])
+        if len(invalid) > 20:
+            report.append(f"... and {len(invalid) - 20} more")
+    kb = make_kb([[("+AddEP bulk", f"admin:addepbulk:{vision}"), ("⟵ Back", "start:menu")]])
+    chunks = split_message(report)
+    for chunk in chunks[:-1]:
+        await sender.send(message.chat.id, message.reply_text, chunk)
+    await sender.send(message.chat.id, message.reply_text, chunks[-1], reply_markup=kb)
+
+# Rendered "Explore All" keyboard, rebuilt only when catalog categories change
+_category_menu = (None, None)   # (catalog.categories_version, InlineKeyboardMarkup)
+
+async def category_menu():
+    global _category_menu
+    cats = await catalog.get_categories()
+    if _category_menu[0] != catalog.categories_version:
+        kb = []
+        for c in cats:
+            name = c.get("name", c["_id"].capitalize())
+            cnt = c.get("count", 0)
+            kb.append([(f"{name} ({cnt})", f"explore:cat:{c['_id']}")])
+        kb.append([("⟵ Back", "start:menu")])
+        _category_menu = (catalog.categories_version, make_kb(kb))
+    return _category_menu[1]
+
+# Category browsing: keyset cursors packed into callback data (64 byte limit)
+# explore:pg:<vision_id>:<n|p>:<created_at ms, base36>:<story _id hex>
+# The cursor story's vision id stands in for the category: slugs can be long
+# (db_seed.py takes any), vision ids are a 2-letter prefix plus a counter.
+_EPOCH = datetime.datetime(1970, 1, 1)
+
+def _page_cb(direction, doc):
+    ms = int((doc["created_at"] - _EPOCH).total_seconds() * 1000)
+    return f"explore:pg:{doc['vision_id']}:{direction}:{_b36(ms)}:{doc['_id']}"
+
+async def _parse_page_cb(data):
+    _, _, key, direction, ms, oid = data.split(":")
+    created_at = _EPOCH + datetime.timedelta(milliseconds=int(ms, 36))
+    # buttons sent before this format carry the slug itself
+    story = await catalog.get_story(key) or await adb.get_story_by_vision(key)
+    slug = story["category"] if story else key
+    return slug, ("prev" if direction == "p" else "next"), (created_at, ObjectId(oid))
+
+def _b36(n):
+    digits = "0123456789abcdefghijklmnopqrstuvwxyz"
+    out = ""
+    while True:
+        n, r = divmod(n, 36)
+        out = digits[r] + out
+        if not n:
+            return out
+
+async def send_category_page(client, chat_id, slug, cursor=None, direction="next"):
+    """One media group of story covers plus one nav message with Listen/Prev/Next."""
+    docs, has_more = await adb.get_stories_page(slug, cursor, direction, limit=config.EXPLORE_PAGE_SIZE)
+    if not docs:
+        await sender.send(chat_id, client.send_message, chat_id, "No stories in this category yet.",
+                                  reply_markup=make_kb([[("⟵ Back", "explore:open")]]))
+        return
+    captions = [story_caption(s) for s in docs]
+    # queued, not awaited: the chat's pacing must not hold an update worker
+    track = lambda sent: autodelete.track(chat_id, sent)
+    if len(docs) == 1:
+        sender.post(chat_id, client.send_photo, chat_id, docs[0]["photo_file_id"], caption=captions[0], done=track)
+    else:
+        sender.post(chat_id, client.send_media_group, chat_id,
+                    [InputMediaPhoto(s["photo_file_id"], caption=c) for s, c in zip(docs, captions)], done=track)
+    has_prev = has_more if direction == "prev" else cursor is not None
+    has_next = has_more if direction == "next" else True
+    listen = [(f"Listen {s['vision_id']}", f"listen:{s['vision_id']}") for s in docs]
+    kb = [listen[i:i + 2] for i in range(0, len(listen), 2)]
+    nav = []
+    if has_prev:
+        nav.append(("⟵ Prev", _page_cb("p", docs[0])))
+    nav.append(("Back", "explore:open"))
+    if has_next:
+        nav.append(("Next ⟶", _page_cb("n", docs[-1])))
+    kb.append(nav)
+    sender.post(chat_id, client.send_message, chat_id, "Choose a story to listen:", reply_markup=make_kb(kb),
+                done=track)
+
 # Top start menu
 async def cmd_start(client, message):
+    # deep links from inline results: /start <vision_id> or /start request
+    parts = (message.text or "").split(maxsplit=1)
+    arg = parts[1].strip() if len(parts) > 1 else ""
+    if arg == "request":
+        await sessions.set_state(message.from_user.id, {"action": "request"})
+        await sender.send(message.chat.id, message.reply_text, "Please write your message for owner/admin. It will be forwarded.")
+        return
+    if arg and await catalog.get_story(arg):
+        await sessions.set_state(message.from_user.id, {"action": "listen", "vision_id": arg})
+        await sender.send(message.chat.id, message.reply_text, "Which episode? Use format Ep1 or Ep1-10 or Ep1-100")
+        return
     kb = [
         [("Explore All", "explore:open"), ("Search", "search:open")],
         [("Request & Comment", "request:open")]
     ]
-    await message.reply_text("Welcome! Choose an option:", reply_markup=make_kb(kb))
+    await sender.send(message.chat.id, message.reply_text, "Welcome! Choose an option:", reply_markup=make_kb(kb))
+
+# Inline mode: "@bot query" answered from the in-memory catalog, no db I/O
+async def on_inline_query(client, iq):
+    query = (iq.query or "").strip()
+    try:
+        offset = max(int(iq.offset or 0), 0)
+    except ValueError:
+        offset = 0
+    page_size = config.INLINE_PAGE_SIZE
+    # one extra hit tells whether there is a next page
+    if query:
+        hits = await catalog.search_stories(query, limit=offset + page_size + 1)
+    else:
+        hits = await catalog.latest_stories(offset + page_size + 1)
+    me = getattr(client, "me", None)
+    username = getattr(me, "username", None)
+    results = [inline_result(s, username) for s in hits[offset:offset + page_size] if s.get("photo_file_id")]
+    more = len(hits) > offset + page_size
+    extra = {}
+    if not hits and not offset:
+        extra = {"switch_pm_text": "Not found? Request it", "switch_pm_parameter": "request"}
+    await iq.answer(results, cache_time=config.INLINE_CACHE_SECONDS,
+                    next_offset=str(offset + page_size) if more else "", **extra)
 
 # Callback router
 async def on_callback_query(client, cbq):
@@ -33,50 +252,57 @@ async def on_callback_query(client, cbq):
 
     # Explore open -> list categories
     if data == "explore:open":
-        cats = db.get_categories()
-        kb = []
-        for c in cats:
-            name = c.get("name", c["_id"].capitalize())
-            cnt = c.get("count", 0)
-            kb.append([(f"{name} ({cnt})", f"explore:cat:{c['_id']}")])
-        kb.append([("⟵ Back", "start:menu")])
-        await cbq.message.edit_text("Choose a category:", reply_markup=make_kb(kb))
+        await sender.send(cbq.message.chat.id, cbq.message.edit_text, "Choose a category:", reply_markup=await category_menu())
         await cbq.answer()
         return
 
     if data.startswith("explore:cat:"):
         slug = data.split(":")[-1]
-        # stream stories (paginated could be added)
-        docs = db.stories.find({"category": slug}).sort("created_at", -1).limit(50)
-        await cbq.message.delete()  # remove the menu message to avoid clutter
-        for s in docs:
-            kb = [[("Listen", f"listen:{s['vision_id']}"), ("Back","explore:open")]]
-            await client.send_photo(cbq.from_user.id, s["photo_file_id"],
-                                    caption=f"{s['vision_id']} - {s['title']}\n\n{s.get('description','')}",
-                                    reply_markup=make_kb(kb))
+        await sender.send(cbq.message.chat.id, cbq.message.delete)  # remove the menu message to avoid clutter
+        await send_category_page(client, cbq.from_user.id, slug)
+        await cbq.answer()
+        return
+
+    if data.startswith("explore:pg:"):
+        slug, direction, cursor = await _parse_page_cb(data)
+        await sender.send(cbq.message.chat.id, cbq.message.delete)  # replace the previous page's nav message
+        await send_category_page(client, cbq.from_user.id, slug, cursor, direction)
         await cbq.answer()
         return
 
     if data.startswith("listen:"):
         vision = data.split(":")[1]
         # set user state to listen flow
-        db.set_state(cbq.from_user.id, {"action":"listen", "vision_id": vision})
-        await cbq.message.reply_text("Which episode? Use format Ep1 or Ep1-10 or Ep1-100")
+        await sessions.set_state(cbq.from_user.id, {"action":"listen", "vision_id": vision})
+        await sender.send(cbq.message.chat.id, cbq.message.reply_text, "Which episode? Use format Ep1 or Ep1-10 or Ep1-100")
         await cbq.answer()
         return
 
     if data == "search:open":
-        db.set_state(uid, {"action":"search"})
-        await cbq.message.reply_text("Please send story name in CAPITAL letters (exact).")
+        await sessions.set_state(uid, {"action":"search"})
+        await sender.send(cbq.message.chat.id, cbq.message.reply_text, "Please send the story name.")
         await cbq.answer()
         return
 
     if data == "request:open":
-        db.set_state(uid, {"action":"request"})
-        await cbq.message.reply_text("Please write your message for owner/admin. It will be forwarded.")
+        await sessions.set_state(uid, {"action":"request"})
+        await sender.send(cbq.message.chat.id, cbq.message.reply_text, "Please write your message for owner/admin. It will be forwarded.")
         await cbq.answer()
         return
 
+    # /requests review pages: requests:pg:<page>, requests:done:<group id>:<page>
+    if data.startswith("requests:"):
+        if not await authz.is_admin(uid) and uid != OWNER_ID:
+            await cbq.answer("You are not authorized.", show_alert=True)
+            return
+        parts = data.split(":")
+        if parts[1] == "done":
+            await inbox.close(parts[2])
+        text, rows = await inbox.review_page(int(parts[-1]))
+        await sender.send(cbq.message.chat.id, cbq.message.edit_text, text, reply_markup=make_kb(rows) if rows else None)
+        await cbq.answer("Marked done." if parts[1] == "done" else None)
+        return
+
     # admin: category command UI (owner/admin only)
     if data.startswith("admin:cat:"):
         # format admin:cat:fantasy:addnew etc
@@ -84,34 +310,34 @@ async def on_callback_query(client, cbq):
         # e.g. admin:cat:fantasy -> show add/update
         if len(parts) >= 3:
             slug = parts[2]
-            if not db.is_admin(uid) and uid != OWNER_ID:
+            if not await authz.is_admin(uid) and uid != OWNER_ID:
                 await cbq.answer("You are not authorized.", show_alert=True)
                 return
             kb = [[("+AddNEW", f"admin:addnew:{slug}"), ("+UpdateOLD", f"admin:update:{slug}")],
                   [("⟵ Back", "start:menu")]]
-            await cbq.message.edit_text(f"Admin options for {slug}", reply_markup=make_kb(kb))
+            await sender.send(cbq.message.chat.id, cbq.message.edit_text, f"Admin options for {slug}", reply_markup=make_kb(kb))
             await cbq.answer()
             return
 
     # admin add NEW flow trigger
     if data.startswith("admin:addnew:"):
         slug = data.split(":")[-1]
-        db.set_state(uid, {"action":"admin_add", "category": slug, "step":"await_title", "tmp":{}})
-        await cbq.message.reply_text("Please send story title (e.g. YODDHA).")
+        await sessions.set_state(uid, {"action":"admin_add", "category": slug, "step":"await_title", "tmp":{}})
+        await sender.send(cbq.message.chat.id, cbq.message.reply_text, "Please send story title (e.g. YODDHA).")
         await cbq.answer()
         return
 
     # admin update OLD trigger
     if data.startswith("admin:update:"):
         slug = data.split(":")[-1]
-        db.set_state(uid, {"action":"admin_update", "category": slug, "step":"await_vision"})
-        await cbq.message.reply_text("Please send vision count number (e.g. fa01).")
+        await sessions.set_state(uid, {"action":"admin_update", "category": slug, "step":"await_vision"})
+        await sender.send(cbq.message.chat.id, cbq.message.reply_text, "Please send vision count number (e.g. fa01).")
         await cbq.answer()
         return
 
     # back handlers
     if data == "start:menu":
-        await cbq.message.edit_text("Welcome! Choose an option:", reply_markup=make_kb([
+        await sender.send(cbq.message.chat.id, cbq.message.edit_text, "Welcome! Choose an option:", reply_markup=make_kb([
             [("Explore All", "explore:open"), ("Search", "search:open")],
             [("Request & Comment", "request:open")]
         ]))
@@ -126,19 +352,27 @@ async def on_callback_query(client, cbq):
         if len(parts) == 4:
             vision = parts[2]
             epno = int(parts[3])
-            db.set_state(uid, {"action":"admin_add_ep", "vision":vision, "start_ep":epno, "step":"await_link", "range":False})
-            await cbq.message.reply_text(f"Send redirect link for Ep{epno}.")
+            await sessions.set_state(uid, {"action":"admin_add_ep", "vision":vision, "start_ep":epno, "step":"await_link", "range":False})
+            await sender.send(cbq.message.chat.id, cbq.message.reply_text, f"Send redirect link for Ep{epno}.")
             await cbq.answer()
             return
-        # admin:adderange:fa01:1:50
+    # admin:addepbulk:fa01 -> paste many episode lines at once
+    if data.startswith("admin:addepbulk:"):
+        vision = data.split(":")[-1]
+        await sessions.set_state(uid, {"action":"admin_add_ep", "vision":vision, "step":"await_bulk"})
+        await sender.send(cbq.message.chat.id, cbq.message.reply_text, f"Send episode lines for {vision}, one per line (or upload a .txt file):\nEp1 https://...\nEp2 https://...\nEp1-50 https://shortlink...")
+        await cbq.answer()
+        return
+
+    # admin:adderange:fa01:1:50
     if data.startswith("admin:adderange:"):
         parts = data.split(":")
         if len(parts) == 5:
             vision = parts[2]
             start = int(parts[3])
             end = int(parts[4])
-            db.set_state(uid, {"action":"admin_add_ep", "vision":vision, "start_ep":start, "end_ep":end, "step":"await_shortlink", "range":True})
-            await cbq.message.reply_text(f"Send shortlink that covers Ep{start}-Ep{end}.")
+            await sessions.set_state(uid, {"action":"admin_add_ep", "vision":vision, "start_ep":start, "end_ep":end, "step":"await_shortlink", "range":True})
+            await sender.send(cbq.message.chat.id, cbq.message.reply_text, f"Send shortlink that covers Ep{start}-Ep{end}.")
             await cbq.answer()
             return
 
@@ -148,7 +382,7 @@ async def on_callback_query(client, cbq):
 async def on_message(client, message):
     uid = message.from_user.id
     txt = (message.text or "").strip()
-    st = db.get_state(uid) or {}
+    st = await sessions.get_state(uid) or {}
 
     # Utility: message id compatibility
     msg_id = getattr(message, "message_id", None) or getattr(message, "id", None)
@@ -157,70 +391,78 @@ async def on_message(client, message):
     if st.get("action") == "listen":
         vision = st.get("vision_id")
         if not vision:
-            db.clear_state(uid)
-            await message.reply_text("Session expired. Try again.")
+            await sessions.clear_state(uid)
+            await sender.send(message.chat.id, message.reply_text, "Session expired. Try again.")
             return
         if not re.match(r"^Ep\d+(-\d+)?$", txt):
-            await message.reply_text("Wrong format. Use Ep1 or Ep1-10 (case sensitive Ep).")
+            await sender.send(message.chat.id, message.reply_text, "Wrong format. Use Ep1 or Ep1-10 (case sensitive Ep).")
             return
         # remove Ep prefix and parse
         part = txt[2:]
         if "-" in part:
             start_s, end_s = part.split("-")
             start = int(start_s); end = int(end_s)
-            doc = db.find_shortlink_for_range(vision, start, end)
-            if doc:
-                await message.reply_text(f"Shortlink: {doc['link']}")
-            else:
-                await message.reply_text("No shortlink found for that range. Sorry.")
         else:
-            ep_no = int(part)
-            doc = db.find_episode_single(vision, ep_no)
-            if doc:
-                await message.reply_text(f"Ep{ep_no} link: {doc['link']}")
-            else:
-                await message.reply_text("Episode not found.")
-        db.clear_state(uid)
+            start = end = int(part)
+        if start > end:
+            start, end = end, start
+        # one index lookup -> fewest shortlinks/single links covering the request
+        parts, missing = await epindex.cover(vision, start, end)
+        await sessions.clear_state(uid)
+        if not parts:
+            await sender.send(message.chat.id, message.reply_text,
+                              "Episode not found." if start == end else "No shortlink found for that range. Sorry.")
+        else:
+            lines = []
+            for s_ep, e_ep, link in parts:
+                if s_ep == e_ep:
+                    lines.append(f"Ep{s_ep} link: {link}")
+                else:
+                    lines.append(f"Ep{s_ep}-{e_ep} shortlink: {link}")
+            for s_ep, e_ep in missing:
+                lines.append(f"Not available yet: Ep{s_ep}" + (f"-{e_ep}" if e_ep != s_ep else ""))
+            for chunk in split_message(lines):
+                sender.post(message.chat.id, message.reply_text, chunk, priority=sender.INTERACTIVE,
+                            done=lambda sent: autodelete.track(message.chat.id, sent))
         return
 
     # Search flow
     if st.get("action") == "search":
-        # User asked to send story name in CAPITAL letters
+        # any case / small typos are fine: served from the in-memory search index
         query = txt.strip()
-        if not query or query != query.upper():
-            await message.reply_text("Please send story name in CAPITAL letters only.")
+        if not query:
+            await sender.send(message.chat.id, message.reply_text, "Please send the story name.")
             return
-        results = db.search_stories_text(query, limit=10)
+        results = await catalog.search_stories(query, limit=10)
+        await sessions.clear_state(uid)
         if not results:
-            await message.reply_text("This story is not available. Use Request & Comment to ask owner.")
+            await sender.send(message.chat.id, message.reply_text, "This story is not available. Use Request & Comment to ask owner.")
         else:
+            # queued, not awaited: ten paced photos would hold an update worker ~10s; the chat FIFO keeps their order
             for r in results:
-                kb = [[("Listen", f"listen:{r['vision_id']}")], [("⟵ Back", "start:menu")]]
-                await client.send_photo(uid, r.get("photo_file_id"), caption=f"{r['vision_id']} - {r.get('title')}\n\n{r.get('description','')}", reply_markup=make_kb(kb))
-        db.clear_state(uid)
+                sender.post(uid, client.send_photo, uid, r.get("photo_file_id"), caption=story_caption(r),
+                            reply_markup=story_kb(r), done=lambda sent: autodelete.track(uid, sent))
         return
 
     # Request & Comment flow
     if st.get("action") == "request":
-        # forward message content to owner/admins channel or to owner id
-        doc = {"from_user": uid, "text": txt, "created_at":__import__("datetime").datetime.utcnow()}
-        db.requests.insert_one(doc)
-        # forward to owner/admin via DM
-        owner_id = db.get_admins_doc().get("owner_id") or OWNER_ID
-        try:
-            # forward original message if possible
-            await client.send_message(owner_id, f"Request from @{message.from_user.username or message.from_user.first_name} ({uid}):\n\n{txt}")
-            await message.reply_text("Your message has been forwarded to the owner/admin. Thank you.")
-        except Exception:
-            await message.reply_text("Couldn't forward. But your request is saved.")
-        db.clear_state(uid)
+        if not txt.strip():
+            await sender.send(message.chat.id, message.reply_text, "Please write your request as text.")
+            return
+        # queued and collapsed with similar asks; owner/admins get it in the next digest
+        group = await inbox.add(uid, txt.strip())
+        reply = "Thank you! Your message has been passed on to the owner/admin."
+        if len(group["users"]) > 1:
+            reply += f" {len(group['users'])} people have asked for this."
+        await sender.send(message.chat.id, message.reply_text, reply)
+        await sessions.clear_state(uid)
         return
 
     # Admin add story flow (state machine)
     if st.get("action") == "admin_add":
-        if not db.is_admin(uid) and uid != OWNER_ID:
-            db.clear_state(uid)
-            await message.reply_text("You are not authorized to perform admin actions.")
+        if not await authz.is_admin(uid) and uid != OWNER_ID:
+            await sessions.clear_state(uid)
+            await sender.send(message.chat.id, message.reply_text, "You are not authorized to perform admin actions.")
             return
         step = st.get("step")
         tmp = st.get("tmp", {})
@@ -230,8 +472,8 @@ async def on_message(client, message):
             tmp["title"] = txt
             st["tmp"] = tmp
             st["step"] = "await_photo"
-            db.set_state(uid, st)
-            await message.reply_text("Now send story photo (as photo, not file).")
+            await sessions.set_state(uid, st)
+            await sender.send(message.chat.id, message.reply_text, "Now send story photo (as photo, not file).")
             return
         if step == "await_photo" and message.photo:
             # get largest photo file_id
@@ -239,61 +481,64 @@ async def on_message(client, message):
             tmp["photo_file_id"] = file_id
             st["tmp"] = tmp
             st["step"] = "await_description"
-            db.set_state(uid, st)
-            await message.reply_text("Photo set successfully. Now send story description.")
+            await sessions.set_state(uid, st)
+            await sender.send(message.chat.id, message.reply_text, "Photo set successfully. Now send story description.")
             return
         if step == "await_description":
             tmp["description"] = txt
             # finalize add
             created_by = uid
-            story = db.add_story(cat, tmp["title"], tmp["photo_file_id"], tmp["description"], created_by)
+            story = await catalog.add_story(cat, tmp["title"], tmp["photo_file_id"], tmp["description"], created_by)
             # post to DB channel
             caption = f"{story['vision_id']} - {story['title']}\n\n{story['description']}"
-            try:
-                await client.send_photo(DB_CHANNEL_ID, story['photo_file_id'], caption=caption)
-            except Exception as e:
-                # still continue
-                print("Failed posting to DB channel:", e)
-            db.clear_state(uid)
+            # queued, not awaited; a failure is logged and the flow continues
+            sender.post(DB_CHANNEL_ID, client.send_photo, DB_CHANNEL_ID, story['photo_file_id'], caption=caption)
+            await sessions.clear_state(uid)
             # send next options (Add EP)
             kb = [
                 [("+AddEP1", f"admin:addep:{story['vision_id']}:1"),
                  ("+AddEP1-10", f"admin:adderange:{story['vision_id']}:1:10")],
                 [("+AddEP1-50", f"admin:adderange:{story['vision_id']}:1:50"),
-                 ("+AddEP1-100", f"admin:adderange:{story['vision_id']}:1:100")]
+                 ("+AddEP1-100", f"admin:adderange:{story['vision_id']}:1:100")],
+                [("+AddEP bulk", f"admin:addepbulk:{story['vision_id']}")]
             ]
-            await message.reply_text(f"Congrats — Story added: {story['vision_id']} ({story['title']}). Choose episode option:", reply_markup=make_kb(kb))
+            await sender.send(message.chat.id, message.reply_text, f"Congrats — Story added: {story['vision_id']} ({story['title']}). Choose episode option:", reply_markup=make_kb(kb))
             return
         # fallback
-        await message.reply_text("Please follow the steps. Send title / photo / description as prompted.")
+        await sender.send(message.chat.id, message.reply_text, "Please follow the steps. Send title / photo / description as prompted.")
         return
 
     # Admin add episode link flow
-    if st.get("action") == "admin_add_ep" and st.get("step") in ("await_link", "await_shortlink"):
-        if not db.is_admin(uid) and uid != OWNER_ID:
-            db.clear_state(uid); await message.reply_text("Not authorized."); return
+    if st.get("action") == "admin_add_ep" and st.get("step") in ("await_link", "await_shortlink", "await_bulk"):
+        if not await authz.is_admin(uid) and uid != OWNER_ID:
+            await sessions.clear_state(uid); await sender.send(message.chat.id, message.reply_text, "Not authorized."); return
+        # many "EpN <url>" / "EpX-Y <shortlink>" lines, or an uploaded .txt of them
+        if st.get("step") == "await_bulk" or message.document or re.match(r"^ep\d", txt, re.IGNORECASE):
+            await sessions.clear_state(uid)
+            await add_episodes_bulk(client, message, st.get("vision"))
+            return
         if st.get("range"):
             # expecting shortlink for a range
             link = txt
             vision = st.get("vision")
             start = st.get("start_ep"); end = st.get("end_ep")
-            db.add_episode(vision, ep_no=None, link=link, short=True, ep_no_start=start, ep_no_end=end)
-            db.clear_state(uid)
-            await message.reply_text(f"Shortlink saved for Ep{start}-Ep{end} successfully.")
+            await epindex.add_episode(vision, ep_no=None, link=link, short=True, ep_no_start=start, ep_no_end=end)
+            await sessions.clear_state(uid)
+            await sender.send(message.chat.id, message.reply_text, f"Shortlink saved for Ep{start}-Ep{end} successfully.")
             return
         else:
             # single ep
             if not txt.startswith("http"):
-                await message.reply_text("Please send a valid URL starting with http/https.")
+                await sender.send(message.chat.id, message.reply_text, "Please send a valid URL starting with http/https.")
                 return
             vision = st.get("vision")
             ep = st.get("start_ep")
-            db.add_episode(vision, ep_no=ep, link=txt, short=False)
-            db.clear_state(uid)
+            await epindex.add_episode(vision, ep_no=ep, link=txt, short=False)
+            await sessions.clear_state(uid)
             # reply and show next ep button (increment)
             next_ep = ep + 1
             kb = [[(f"+AddEP{next_ep}", f"admin:addep:{vision}:{next_ep}"),("⟵ Back","start:menu")]]
-            await message.reply_text(f"Ep{ep} link saved successfully. Add next?", reply_markup=make_kb(kb))
+            await sender.send(message.chat.id, message.reply_text, f"Ep{ep} link saved successfully. Add next?", reply_markup=make_kb(kb))
             return
 
     # default: if no state matched, allow commands like /ping or owner admin commands
@@ -301,16 +546,30 @@ async def on_message(client, message):
         cmd = txt.split()[0].lstrip("/").lower()
         # Admin category command creation: only owner/admin
         if cmd in ("fantasy","love","sifi","sci_fi","mythology","thriller"):
-            if not db.is_admin(uid) and uid != OWNER_ID:
-                await message.reply_text("Not authorized to use this command.")
+            if not await authz.is_admin(uid) and uid != OWNER_ID:
+                await sender.send(message.chat.id, message.reply_text, "Not authorized to use this command.")
                 return
             # show admin menu for this category
             kb = [[("+AddNEW", f"admin:addnew:{cmd}"), ("+UpdateOLD", f"admin:update:{cmd}")]]
-            await message.reply_text(f"Admin options for {cmd}:", reply_markup=make_kb(kb))
+            await sender.send(message.chat.id, message.reply_text, f"Admin options for {cmd}:", reply_markup=make_kb(kb))
+            return
+        if cmd == "stats":
+            if not await authz.is_admin(uid) and uid != OWNER_ID:
+                await sender.send(message.chat.id, message.reply_text, "Not authorized to use this command.")
+                return
+            for chunk in split_message(metrics.summary().splitlines()):
+                await sender.send(message.chat.id, message.reply_text, chunk)
+            return
+        if cmd == "requests":
+            if not await authz.is_admin(uid) and uid != OWNER_ID:
+                await sender.send(message.chat.id, message.reply_text, "Not authorized to use this command.")
+                return
+            text, rows = await inbox.review_page(0)
+            await sender.send(message.chat.id, message.reply_text, text, reply_markup=make_kb(rows) if rows else None)
             return
         if cmd == "ping":
-            await message.reply_text("Pong ✅")
+            await sender.send(message.chat.id, message.reply_text, "Pong ✅")
             return
 
     # If nothing matched:
-    await message.reply_text("I didn't understand that. Use the buttons or /start to go to main menu.")
+    await sender.send(message.chat.id, message.reply_text, "I didn't understand that. Use the buttons or /start to go to main menu.")
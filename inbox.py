@@ -0,0 +1,227 @@
+# inbox.py
+# Request & Comment pipeline. Each ask is queued (one insert_many per
+# REQUEST_FLUSH_SECONDS) and collapsed into a request group: an ask is matched
+# fuzzily against the open groups (a search.SearchIndex of their own), then
+# against the story catalog, so asks about the same story share a group.
+# Group counts are written as $inc deltas, so several worker processes can
+# feed the same groups (see workers.py). Owner/admins get one digest every
+# REQUEST_DIGEST_MINUTES and review open groups with /requests, so outbound
+# messages don't grow with the number of asks.
+import asyncio
+import datetime
+from bson import ObjectId
+import adb
+import authz
+import catalog
+import config
+import db
+import search
+import sender
+
+STORY_MATCH_SCORE = 0.6   # ask is about an existing story (e.g. "yoddha part 2")
+GROUP_MATCH_SCORE = 0.75  # ask repeats an open group
+PAGE_SIZE = 10            # /requests review page
+DIGEST_LINES = 30
+MAX_USERS = 20            # user ids kept per group (count keeps going)
+# words that say nothing about *what* is asked for
+FILLER = frozenset("please pls plz kindly add upload uploaded story stories kahani want need request "
+                   "bhai bro sir the a an of".split())
+
+_groups = {}              # group id (str) -> {_id, key, vision_id, count, users} for matching
+_by_story = {}            # vision_id -> group id
+_index = search.SearchIndex()   # open groups, title = request key
+_unsaved = []             # raw request docs waiting for insert_many
+_deltas = {}              # group id -> [count, user ids, last_at] not yet written
+_flush_handle = None
+_loaded = False
+_digest_task = None
+_client = None
+
+def request_key(text):
+    words = search.normalize(text).split()
+    return " ".join(w for w in words if w not in FILLER) or " ".join(words)
+
+async def ensure_loaded():
+    global _loaded
+    if _loaded:
+        return
+    _loaded = True
+    await sync()
+
+async def sync():
+    """Reload open groups, picking up groups other processes opened or closed."""
+    docs = await adb.get_open_request_groups()
+    open_ids = set()
+    for g in docs:
+        gid = str(g["_id"])
+        open_ids.add(gid)
+        if gid not in _groups:
+            _track(g)
+        else:
+            _groups[gid]["count"] = max(_groups[gid]["count"], g.get("count", 0))
+    for gid in list(_groups):
+        if gid not in open_ids and gid not in _deltas:
+            _forget(gid)
+
+def _track(group):
+    gid = str(group["_id"])
+    _groups[gid] = group
+    if group.get("vision_id"):
+        _by_story[group["vision_id"]] = gid
+    _index.add({"vision_id": gid, "title": group["key"]})
+
+def _forget(gid):
+    group = _groups.pop(gid, None)
+    if group is None:
+        return
+    if group.get("vision_id") and _by_story.get(group["vision_id"]) == gid:
+        del _by_story[group["vision_id"]]
+    _index.remove(gid)
+
+async def _find_group(key):
+    """(open group id or None, vision_id of the story the ask is about or None)"""
+    hits = _index.search(key, limit=1, min_score=GROUP_MATCH_SCORE)
+    if hits:
+        return hits[0]["vision_id"], None
+    stories = await catalog.search_stories(key, limit=1, min_score=STORY_MATCH_SCORE)
+    if stories:
+        vision = stories[0]["vision_id"]
+        return _by_story.get(vision), vision
+    return None, None
+
+async def add(user_id, text):
+    """Queue one ask; returns its (possibly shared) group."""
+    await ensure_loaded()
+    now = datetime.datetime.utcnow()
+    key = request_key(text)
+    gid, vision = await _find_group(key)
+    group = _groups.get(gid)
+    if group is None:
+        group = {"_id": db.new_id(), "key": key, "text": text[:300], "vision_id": vision,
+                 "count": 0, "users": [], "first_at": now}
+        _track(group)
+        gid = str(group["_id"])
+    group["count"] += 1
+    delta = _deltas.setdefault(gid, [0, [], now])
+    delta[0] += 1
+    delta[2] = now
+    if user_id not in group["users"] and len(group["users"]) < MAX_USERS:
+        group["users"].append(user_id)
+        delta[1].append(user_id)
+    _unsaved.append({"from_user": user_id, "text": text, "group_id": group["_id"], "created_at": now})
+    _schedule_flush()
+    return group
+
+def _schedule_flush():
+    global _flush_handle
+    if _flush_handle is None:
+        loop = asyncio.get_running_loop()
+        _flush_handle = loop.call_later(config.REQUEST_FLUSH_SECONDS, lambda: asyncio.ensure_future(flush()))
+
+async def flush():
+    global _unsaved, _deltas, _flush_handle
+    if _flush_handle is not None:
+        _flush_handle.cancel()
+        _flush_handle = None
+    docs, _unsaved = _unsaved, []
+    deltas, _deltas = _deltas, {}
+    ops = []
+    for gid, (count, users, last_at) in deltas.items():
+        group = _groups.get(gid) or {"_id": ObjectId(gid), "key": "", "text": "", "vision_id": None, "first_at": last_at}
+        ops.append((group, count, users, last_at))
+    try:
+        await adb.add_requests(docs)
+    except Exception as e:
+        print("Failed saving requests:", e)
+        _unsaved[:0] = docs
+    try:
+        await adb.apply_request_deltas(ops, MAX_USERS)
+    except Exception as e:
+        print("Failed saving request groups:", e)
+        for gid, delta in deltas.items():
+            mine = _deltas.setdefault(gid, [0, [], delta[2]])
+            mine[0] += delta[0]
+            mine[1][:0] = delta[1]
+    if _unsaved or _deltas:
+        _schedule_flush()
+
+async def close(gid):
+    """Mark a group done; it leaves the digest and the review list."""
+    _forget(gid)
+    return await adb.close_request_group(ObjectId(gid))
+
+def _label(group):
+    story = f" [{group['vision_id']}]" if group.get("vision_id") else ""
+    return f"{group['text'][:80]}{story}"
+
+async def digest():
+    """Send one summary of asks since the last digest to the owner and admins."""
+    if _client is None:
+        return
+    await flush()
+    fresh = sorted(await adb.get_request_digest(), key=lambda g: (-g["new"], -g["count"]))
+    if not fresh:
+        return
+    total = sum(g["new"] for g in fresh)
+    lines = [f"Requests digest: {total} new in {len(fresh)} topics."]
+    for g in fresh[:DIGEST_LINES]:
+        lines.append(f"• {_label(g)} — {g['new']} new, {g['count']} total")
+    if len(fresh) > DIGEST_LINES:
+        lines.append(f"... and {len(fresh) - DIGEST_LINES} more.")
+    lines.append("Review with /requests")
+    text = "\n".join(lines)[:4096]
+    recipients = await authz.get_admin_ids()
+    results = await asyncio.gather(*[sender.send(uid, _client.send_message, uid, text, priority=sender.BULK)
+                                     for uid in recipients], return_exceptions=True)
+    if all(isinstance(r, Exception) for r in results):
+        print("Failed sending requests digest:", results[0])
+        return
+    await adb.ack_request_digest(fresh)
+
+async def _digest_loop():
+    while True:
+        await asyncio.sleep(config.REQUEST_DIGEST_MINUTES * 60)
+        try:
+            await digest()
+        except Exception as e:
+            print("Requests digest failed:", e)
+
+async def review_page(page):
+    """(text, keyboard rows) for one /requests page of open groups, most asked first."""
+    await flush()
+    page = max(page, 0)
+    groups, total = await adb.get_request_groups_page(page * PAGE_SIZE, PAGE_SIZE)
+    pages = max(1, (total + PAGE_SIZE - 1) // PAGE_SIZE)
+    if not groups and page > 0:
+        return await review_page(pages - 1)
+    if not groups:
+        return "No open requests.", []
+    lines = [f"Open requests ({total}), page {page + 1}/{pages}:"]
+    rows, done = [], []
+    for n, g in enumerate(groups, page * PAGE_SIZE + 1):
+        lines.append(f"{n}. {_label(g)} — {g['count']}x, last {g['last_at']:%d %b %H:%M}")
+        done.append((f"✓ {n}", f"requests:done:{g['_id']}:{page}"))
+    rows.extend(done[i:i + 5] for i in range(0, len(done), 5))
+    nav = []
+    if page > 0:
+        nav.append(("⟵ Prev", f"requests:pg:{page - 1}"))
+    if page < pages - 1:
+        nav.append(("Next ⟶", f"requests:pg:{page + 1}"))
+    if nav:
+        rows.append(nav)
+    return "\n".join(lines)[:4096], rows
+
+async def start(client, digests=True):
+    """Load open groups; digests=False for every process but one (workers.py)."""
+    global _client, _digest_task
+    _client = client
+    await ensure_loaded()
+    if digests and config.REQUEST_DIGEST_MINUTES > 0:
+        _digest_task = asyncio.ensure_future(_digest_loop())
+
+async def stop():
+    global _digest_task
+    if _digest_task is not None:
+        _digest_task.cancel()
+        _digest_task = None
+    await flush()
@@ -0,0 +1,217 @@
+# metrics.py
+# In-process metrics (counters, histograms, callback gauges), pymongo command
+# timings, and a tiny HTTP server on PORT serving /healthz, /readyz and
+# Prometheus-format /metrics. No extra dependencies.
+import asyncio
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from pymongo import monitoring
+import config
+
+# seconds; covers cache hits (sub-ms) up to slow Atlas round trips
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_lock = threading.Lock()      # pymongo listeners fire on db worker threads
+_counters = {}                # (name, labels) -> value
+_histograms = {}              # (name, labels) -> [bucket counts..., +Inf count, sum]
+_gauges = {}                  # name -> (help, callable)
+_help = {}
+ready = False                 # flipped by bot.py once the catalog is warm
+
+def _key(name, labels):
+    return name, tuple(sorted((labels or {}).items()))
+
+def inc(name, labels=None, n=1, help=""):
+    k = _key(name, labels)
+    with _lock:
+        _counters[k] = _counters.get(k, 0) + n
+        _help.setdefault(name, help)
+
+def observe(name, value, labels=None, help=""):
+    k = _key(name, labels)
+    with _lock:
+        h = _histograms.get(k)
+        if h is None:
+            h = _histograms[k] = [0] * (len(BUCKETS) + 1) + [0.0]
+            _help.setdefault(name, help)
+        h[bisect.bisect_left(BUCKETS, value)] += 1
+        h[-1] += value
+
+def gauge(name, fn, help=""):
+    """Register a gauge read at scrape time, e.g. gauge("queue_depth", scheduler.depth)."""
+    _gauges[name] = (help, fn)
+
+def cache_gauges(name, cache):
+    """Expose a cache.TTLCache's size and hit counts, e.g. cache_gauges("search", _search_cache)."""
+    gauge(f"bot_cache_{name}_entries", lambda: len(cache), help=f"Entries in the {name} cache")
+    gauge(f"bot_cache_{name}_hits", lambda: cache.hits, help=f"{name} cache hits since start")
+    gauge(f"bot_cache_{name}_misses", lambda: cache.misses, help=f"{name} cache misses since start")
+    gauge(f"bot_cache_{name}_hit_ratio", cache.hit_ratio, help=f"{name} cache hits / lookups")
+
+@contextmanager
+def timer(name, labels=None, help=""):
+    t = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - t, labels, help)
+
+def callback_route(data):
+    """Low-cardinality label for callback data: explore:cat:fantasy -> explore:cat, listen:fa01 -> listen."""
+    parts = (data or "").split(":")
+    if parts[0] in ("explore", "admin", "search", "request", "requests", "start") and len(parts) > 1:
+        return ":".join(parts[:2])
+    return parts[0] or "none"
+
+@contextmanager
+def track_update(kind, route):
+    """Time one update handler call and count failures."""
+    labels = {"kind": kind, "route": route}
+    t = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        inc("bot_update_errors_total", labels, help="Update handlers that raised")
+        raise
+    finally:
+        observe("bot_update_seconds", time.perf_counter() - t, labels, help="Update handling latency")
+
+# ------------------------------------------------------------ pymongo timings
+
+class MongoCommandTimer(monitoring.CommandListener):
+    """Per collection/operation timings from pymongo command monitoring."""
+    def __init__(self):
+        self._pending = {}
+
+    def started(self, event):
+        coll = event.command.get(event.command_name)
+        if not isinstance(coll, str):
+            coll = "-"
+        self._pending[(event.connection_id, event.request_id)] = (coll, event.command_name)
+
+    def _done(self, event, failed):
+        coll, cmd = self._pending.pop((event.connection_id, event.request_id), ("-", event.command_name))
+        labels = {"collection": coll, "command": cmd}
+        observe("bot_db_command_seconds", event.duration_micros / 1e6, labels, help="MongoDB command latency")
+        if failed:
+            inc("bot_db_command_failures_total", labels, help="MongoDB commands that failed")
+
+    def succeeded(self, event):
+        self._done(event, False)
+
+    def failed(self, event):
+        self._done(event, True)
+
+# ------------------------------------------------------------------- exports
+
+def _fmt_labels(labels, extra=()):
+    items = list(labels) + list(extra)
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{str(v)}"' for k, v in items) + "}"
+
+def render():
+    """Prometheus text exposition format."""
+    lines = []
+    with _lock:
+        counters = dict(_counters)
+        histograms = {k: list(v) for k, v in _histograms.items()}
+    seen = set()
+    for (name, labels), value in sorted(counters.items()):
+        if name not in seen:
+            seen.add(name)
+            lines.append(f"# HELP {name} {_help.get(name, '')}")
+            lines.append(f"# TYPE {name} counter")
+        lines.append(f"{name}{_fmt_labels(labels)} {value}")
+    for (name, labels), h in sorted(histograms.items()):
+        if name not in seen:
+            seen.add(name)
+            lines.append(f"# HELP {name} {_help.get(name, '')}")
+            lines.append(f"# TYPE {name} histogram")
+        cumulative = 0
+        for bound, count in zip(BUCKETS, h):
+            cumulative += count
+            lines.append(f"{name}_bucket{_fmt_labels(labels, [('le', bound)])} {cumulative}")
+        cumulative += h[len(BUCKETS)]
+        lines.append(f"{name}_bucket{_fmt_labels(labels, [('le', '+Inf')])} {cumulative}")
+        lines.append(f"{name}_sum{_fmt_labels(labels)} {h[-1]}")
+        lines.append(f"{name}_count{_fmt_labels(labels)} {cumulative}")
+    for name, (help_text, fn) in sorted(_gauges.items()):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} gauge")
+        lines.append(f"{name} {fn()}")
+    return "\n".join(lines) + "\n"
+
+def _quantile(h, q):
+    total = sum(h[:-1])
+    if not total:
+        return 0.0
+    target, cumulative = q * total, 0
+    for bound, count in zip(list(BUCKETS) + [float("inf")], h[:-1]):
+        cumulative += count
+        if cumulative >= target:
+            return bound
+    return float("inf")
+
+def summary(top=8):
+    """Short human-readable report for the admin /stats command."""
+    with _lock:
+        histograms = {k: list(v) for k, v in _histograms.items()}
+        counters = dict(_counters)
+    out = ["Updates (count, avg ms, p99 <= ms):"]
+    for (name, labels), h in sorted(histograms.items(), key=lambda kv: -kv[1][-1]):
+        if name != "bot_update_seconds":
+            continue
+        n = sum(h[:-1])
+        d = dict(labels)
+        out.append(f"  {d['kind']} {d['route']}: {n}, {h[-1] / n * 1000:.1f}, {_quantile(h, 0.99) * 1000:g}")
+    out.append("DB commands by total time (count, avg ms):")
+    db_rows = [(k, h) for k, h in histograms.items() if k[0] == "bot_db_command_seconds"]
+    for (name, labels), h in sorted(db_rows, key=lambda kv: -kv[1][-1])[:top]:
+        n = sum(h[:-1])
+        d = dict(labels)
+        out.append(f"  {d['collection']}.{d['command']}: {n}, {h[-1] / n * 1000:.1f}")
+    errors = sum(v for (name, _), v in counters.items() if name == "bot_update_errors_total")
+    out.append(f"Handler errors: {errors}")
+    for name, (_, fn) in sorted(_gauges.items()):
+        if name.startswith("bot_cache_") and name.endswith(("_hits", "_misses")):
+            continue   # hit_ratio says it; raw counts are on /metrics
+        out.append(f"{name}: {fn()}")
+    return "\n".join(out)
+
+# --------------------------------------------------------------- HTTP server
+
+async def _handle(reader, writer):
+    try:
+        request_line = await asyncio.wait_for(reader.readline(), timeout=5)
+        # drain headers; nothing here needs them
+        while (await asyncio.wait_for(reader.readline(), timeout=5)) not in (b"\r\n", b"\n", b""):
+            pass
+        parts = request_line.decode("latin-1").split()
+        path = parts[1].split("?")[0] if len(parts) > 1 else "/"
+        if path == "/healthz":
+            status, body, ctype = "200 OK", "ok\n", "text/plain"
+        elif path == "/readyz":
+            status = "200 OK" if ready else "503 Service Unavailable"
+            body, ctype = ("ready\n" if ready else "starting\n"), "text/plain"
+        elif path == "/metrics":
+            status, body, ctype = "200 OK", render(), "text/plain; version=0.0.4"
+        else:
+            status, body, ctype = "404 Not Found", "not found\n", "text/plain"
+        data = body.encode()
+        writer.write(f"HTTP/1.1 {status}\r\nContent-Type: {ctype}\r\nContent-Length: {len(data)}\r\n"
+                     f"Connection: close\r\n\r\n".encode() + data)
+        await writer.drain()
+    except (asyncio.TimeoutError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+async def start_server(port=None):
+    """Serve health and metrics on PORT (0 / unset disables it)."""
+    port = config.PORT if port is None else port
+    if not port:
+        return None
+    return await asyncio.start_server(_handle, "0.0.0.0", port)
@@ -0,0 +1,121 @@
+# migrations.py
+# Versioned schema/index migrations, run explicitly instead of on every import:
+#
+#   python migrations.py            # apply pending migrations
+#   python migrations.py --status   # show current / latest version
+#
+# The applied version lives in schema_migrations {_id: "schema", version: N}.
+# bot.py refuses to report ready (and does not start taking updates) until the
+# database is at LATEST, unless AUTO_MIGRATE=1 lets it apply them itself.
+import argparse
+import datetime
+import sys
+from pymongo import ASCENDING, DESCENDING, TEXT
+from pymongo.errors import OperationFailure
+import config
+import db
+
+def _m1_baseline_indexes(d):
+    """Indexes that db.ensure_indexes() used to build at import time."""
+    d.stories.create_index([("vision_id", ASCENDING)], unique=True)
+    # text index on title + description (search itself is served in memory by search.py)
+    try:
+        d.stories.create_index([("title", TEXT), ("description", TEXT)], name="text_title_description",
+                               default_language="english")
+    except OperationFailure:
+        # an existing text index with other options; nothing in the bot depends on it
+        pass
+    # bulk import idempotency check (db_seed.py)
+    d.stories.create_index([("category", ASCENDING), ("title", ASCENDING)], name="category_title")
+    # keyset pagination for category browsing (see get_stories_page)
+    d.stories.create_index([("category", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+                           name="category_created")
+    # episodes range index for shortlinks
+    d.episodes.create_index([("story_vision_id", ASCENDING), ("ep_no_start", ASCENDING), ("ep_no_end", ASCENDING)])
+    # abandoned user states expire on their own (durable backstop for sessions.py)
+    d.user_states.create_index([("updated_at", ASCENDING)], name="state_ttl",
+                               expireAfterSeconds=config.SESSION_TTL_SECONDS)
+
+def _m2_partial_episode_unique(d):
+    """
+    The old sparse unique (story_vision_id, ep_no) index also indexed range
+    documents (ep_no missing -> null), so a story could only ever have one
+    shortlink. Only single-episode documents should be unique per ep_no.
+    """
+    try:
+        d.episodes.drop_index("story_vision_id_1_ep_no_1")
+    except OperationFailure:
+        pass  # fresh database
+    d.episodes.create_index([("story_vision_id", ASCENDING), ("ep_no", ASCENDING)], name="story_ep_no_unique",
+                            unique=True, partialFilterExpression={"ep_no": {"$exists": True}})
+
+def _m3_pending_deletes(d):
+    """autodelete.py loads pending deletions in due order at startup."""
+    d.pending_deletes.create_index([("due_at", ASCENDING)], name="due_at")
+
+def _m4_request_groups(d):
+    """inbox.py loads open request groups at startup."""
+    d.request_groups.create_index([("status", ASCENDING)], name="status")
+
+def _m5_request_groups_review(d):
+    """/requests pages open groups by count (inbox.review_page)."""
+    d.request_groups.create_index([("status", ASCENDING), ("count", DESCENDING), ("_id", ASCENDING)],
+                                  name="status_count")
+
+def _m6_snapshot_watermarks(d):
+    """snapshot.py fetches only stories / episodes newer than its watermarks."""
+    d.stories.create_index([("created_at", ASCENDING)], name="created_at")
+    d.episodes.create_index([("added_at", ASCENDING)], name="added_at")
+
+MIGRATIONS = [
+    (1, "baseline indexes", _m1_baseline_indexes),
+    (2, "partial unique index on single episodes", _m2_partial_episode_unique),
+    (3, "pending_deletes by due_at", _m3_pending_deletes),
+    (4, "request_groups by status", _m4_request_groups),
+    (5, "request_groups review order", _m5_request_groups_review),
+    (6, "stories.created_at / episodes.added_at", _m6_snapshot_watermarks),
+]
+LATEST = MIGRATIONS[-1][0]
+
+def current_version():
+    doc = db.connect().schema_migrations.find_one({"_id": "schema"})
+    return doc.get("version", 0) if doc else 0
+
+def sync_ttl(d):
+    """Keep the user_states TTL in line with SESSION_TTL_SECONDS (cheap, runs every migrate)."""
+    try:
+        d.command({"collMod": "user_states",
+                   "index": {"name": "state_ttl", "expireAfterSeconds": config.SESSION_TTL_SECONDS}})
+    except Exception:
+        # index not created yet, or a backend without collMod (mongomock)
+        pass
+
+def migrate(log=print):
+    d = db.connect()
+    version = current_version()
+    for number, description, fn in MIGRATIONS:
+        if number <= version:
+            continue
+        log(f"applying migration {number}: {description}")
+        fn(d)
+        d.schema_migrations.update_one(
+            {"_id": "schema"},
+            {"$set": {"version": number, "updated_at": datetime.datetime.utcnow()}},
+            upsert=True,
+        )
+    sync_ttl(d)
+    return current_version()
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Apply MongoDB schema/index migrations.")
+    p.add_argument("--status", action="store_true", help="print versions and exit")
+    args = p.parse_args(argv)
+    config.validate(required=("DATABASE_URL",))
+    if args.status:
+        print(f"current: {current_version()} latest: {LATEST}")
+        return 0
+    print(f"schema at version {migrate()} (latest {LATEST})")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,255 @@
+# replay.py
+# Replays tracer.py traces (TRACE_PATH files) through the handlers, via
+# workers.dispatch, against bench.FakeClient and a local Mongo stand-in
+# seeded like bench.py. Updates are released on the recorded timeline scaled
+# by --speed (1 = real time, 100 = 100x faster, 0 = as fast as possible);
+# each user's updates stay in order, users run concurrently.
+#
+# Traces carry no content, so replay fills it in: pseudonyms become user ids
+# 1000+, recorded vision ids are mapped onto seeded stories, free text becomes
+# that many title words, bulk episode lists / photos / documents are
+# regenerated at their recorded size.
+#
+#   python replay.py trace.jsonl --speed 10
+#   python replay.py trace.jsonl.0 trace.jsonl.1 --speed 1,10,50,100   # find the saturation point
+#   python replay.py trace.jsonl --speed 0 --json out.json --baseline last.json
+#
+# "lag" is how late an update started against its scaled arrival time; once
+# p99 lag keeps growing with speed, the build is saturated. Every speed runs
+# in a fresh process on a freshly seeded database, so runs are comparable.
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import re
+import sys
+import time
+import bench
+
+_VISION = re.compile(r"^[a-z]{2}\d{2,}$")
+
+def load(paths):
+    """Trace records from all files, merged on one timeline; rec["at"] is seconds since the first."""
+    records = []
+    for path in paths:
+        t0 = 0
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    continue   # torn last line of a trace still being written
+                if "trace" in rec:
+                    t0 = rec["t0"]
+                else:
+                    rec["at"] = (t0 + rec["t"]) / 1000.0
+                    records.append(rec)
+    records.sort(key=lambda r: r["at"])
+    if records:
+        first = records[0]["at"]
+        for rec in records:
+            rec["at"] -= first
+    return records
+
+class Rebuilder:
+    """Turns trace records back into updates.to_dict payloads for the seeded database."""
+    def __init__(self, titles, rnd):
+        self.visions = [v for v, _ in titles]
+        self.rnd = rnd
+        self.users = {}     # pseudonym -> user id
+        self.mapped = {}    # recorded vision id -> seeded vision id
+        self.seq = 0
+
+    def user_id(self, pseudo):
+        return self.users.setdefault(pseudo, 1000 + len(self.users))
+
+    def _vision(self, token):
+        if not _VISION.match(token):
+            return token
+        if token not in self.mapped:
+            self.mapped[token] = self.visions[len(self.mapped) % len(self.visions)]
+        return self.mapped[token]
+
+    def _text(self, m):
+        if "text" in m:
+            return " ".join(self._vision(w) for w in m["text"].split(" "))
+        if "eplines" in m:
+            return "\n".join(f"Ep{n} https://ep/{n}" for n in range(1, m["eplines"] + 1))
+        if m.get("words"):
+            return " ".join(self.rnd.choice(bench.TITLE_WORDS) for _ in range(min(m["words"], 8)))
+        return None
+
+    def build(self, rec):
+        uid = self.user_id(rec["u"])
+        user = {"id": uid, "username": None, "first_name": None}
+        self.seq += 1
+        if rec["k"] == "callback":
+            data = ":".join(self._vision(part) for part in rec["d"].split(":"))
+            return {"kind": "callback", "id": str(self.seq), "data": data, "user": user,
+                    "message": {"chat_id": uid, "message_id": 1}}
+        m = rec.get("m") or {}
+        if rec["k"] == "inline":
+            return {"kind": "inline", "id": str(self.seq), "query": self._text(m) or "",
+                    "offset": m.get("offset", ""), "user": user}
+        d = {"kind": "message", "user": user, "chat_id": uid, "message_id": self.seq}
+        text = self._text(m)
+        if m.get("photo"):
+            d["photo_file_id"] = "PHOTO_FILE_ID"
+            d["caption"] = text
+        elif "doc_bytes" in m:
+            d["document"] = {"file_id": "DOC_FILE_ID", "file_size": m["doc_bytes"], "file_name": "episodes.txt"}
+            d["caption"] = text
+        else:
+            d["text"] = text
+        return d
+
+def route(rec):
+    """Report row for a record: kind plus callback route or the conversation state it arrived in."""
+    import metrics
+    if rec["k"] == "callback":
+        return metrics.callback_route(rec["d"])
+    if rec["k"] == "inline":
+        return "inline"
+    text = (rec.get("m") or {}).get("text", "")
+    if text.startswith("/"):
+        return text.split()[0]
+    return f"msg:{rec.get('s0') or 'none'}"
+
+async def replay(records, rebuilder, client, speed):
+    import workers
+    loop = asyncio.get_running_loop()
+    samples = {}   # route -> [(seconds, counters)]
+    lags = []
+    tails = {}     # user id -> task handling that user's latest update
+
+    async def handle(rec, d, due, previous):
+        if previous is not None:
+            await asyncio.wait([previous])
+        lags.append(max(0.0, loop.time() - due))
+        counters = {}
+        token = bench._counters.set(counters)
+        try:
+            t = time.perf_counter()
+            try:
+                await workers.dispatch(client, d)
+            except Exception as e:
+                print(f"{route(rec)}: {type(e).__name__}: {e}")
+            elapsed = time.perf_counter() - t
+        finally:
+            bench._counters.reset(token)
+        samples.setdefault(route(rec), []).append((elapsed, counters))
+
+    start = loop.time()
+    for rec in records:
+        due = start + (rec["at"] / speed if speed else 0.0)
+        if due > loop.time():
+            await asyncio.sleep(due - loop.time())
+        d = rebuilder.build(rec)
+        uid = d["user"]["id"]
+        task = asyncio.ensure_future(handle(rec, d, due, tails.get(uid)))
+        tails[uid] = task
+        task.add_done_callback(lambda t, uid=uid: tails.pop(uid) if tails.get(uid) is t else None)
+    if tails:
+        await asyncio.wait(list(tails.values()))
+    wall = loop.time() - start
+    await bench.drain_sends()
+    samples = bench.costs(samples)
+    report = bench.summarize(samples, wall)
+    span = records[-1]["at"] if records else 0.0
+    report["speed"] = speed
+    report["offered_per_second"] = round(len(records) / (span / speed), 1) if speed and span else None
+    latencies = [row[0] * 1000 for rows in samples.values() for row in rows]
+    report["p50_ms"] = round(bench.percentile(latencies, 50), 3)
+    report["p99_ms"] = round(bench.percentile(latencies, 99), 3)
+    report["lag_p50_ms"] = round(bench.percentile(lags, 50) * 1000, 3)
+    report["lag_p99_ms"] = round(bench.percentile(lags, 99) * 1000, 3)
+    return report
+
+def run_one(args, speed, results=None):
+    """Seed a fresh database and replay the trace once (in a spawned process when results is a queue)."""
+    bench.setup_env(args)
+    import db
+    import catalog
+    import migrations
+    records = load(args.trace)
+    if args.limit:
+        records = records[:args.limit]
+    users = len({r["u"] for r in records})
+    migrations.migrate(log=lambda line: None)
+    titles = bench.seed(db, args.categories, args.stories, args.episodes, users, random.Random(args.seed))
+    bench.wrap_collections(db, args.db_latency / 1000.0)
+    client = bench.FakeClient(args.api_latency / 1000.0)
+
+    async def go():
+        await catalog.ensure_loaded()
+        return await replay(records, Rebuilder(titles, random.Random(args.seed)), client, speed)
+
+    report = asyncio.run(go())
+    if results is not None:
+        results.put(report)
+    return report
+
+def build_parser():
+    p = argparse.ArgumentParser(description="Replay recorded update traces against local stand-ins.")
+    p.add_argument("trace", nargs="+", help="trace file(s) written with TRACE_PATH")
+    p.add_argument("--speed", default="1", help="comma-separated speed-ups, 1..100 (0 = no pacing)")
+    p.add_argument("--limit", type=int, default=0, help="replay only the first N updates")
+    p.add_argument("--backend", choices=("mongomock", "mongo"), default="mongomock")
+    p.add_argument("--categories", type=int, default=4)
+    p.add_argument("--stories", type=int, default=25, help="stories per category")
+    p.add_argument("--episodes", type=int, default=80, help="episodes per story")
+    p.add_argument("--db-latency", type=float, default=0.0, help="injected ms per DB round trip")
+    p.add_argument("--api-latency", type=float, default=0.0, help="injected ms per Telegram API call")
+    p.add_argument("--telegram-limits", action="store_true", help="keep real send rate limits")
+    p.add_argument("--seed", type=int, default=1)
+    p.add_argument("--json", help="write the reports to this file")
+    p.add_argument("--baseline", help="previous --json file; exit 1 on regressions at the same speeds")
+    p.add_argument("--tolerance", type=float, default=0.2, help="allowed regression vs baseline (0.2 = 20%%)")
+    return p
+
+def main(argv=None):
+    p = build_parser()
+    args = p.parse_args(argv)
+    speeds = [float(s) for s in args.speed.split(",")]
+    if any(s < 0 or s > 100 for s in speeds):
+        p.error("--speed values must be between 0 and 100")
+    # never record the replay itself
+    os.environ["TRACE_PATH"] = ""
+    if len(speeds) == 1:
+        reports = {f"{speeds[0]:g}": run_one(args, speeds[0])}
+        bench.print_report(reports[f"{speeds[0]:g}"])
+    else:
+        ctx = multiprocessing.get_context("spawn")
+        reports = {}
+        for speed in speeds:
+            results = ctx.Queue()
+            proc = ctx.Process(target=run_one, args=(args, speed, results), daemon=True)
+            proc.start()
+            reports[f"{speed:g}"] = results.get()
+            proc.join()
+    print(f"{'speed':>7}{'offered/s':>11}{'handled/s':>11}{'p50 ms':>9}{'p99 ms':>9}{'lag p99 ms':>12}")
+    for key, r in reports.items():
+        offered = f"{r['offered_per_second']:.1f}" if r["offered_per_second"] else "-"
+        print(f"{key:>7}{offered:>11}{r['updates_per_second']:>11.1f}{r['p50_ms']:>9.2f}{r['p99_ms']:>9.2f}{r['lag_p99_ms']:>12.2f}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"speeds": reports}, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["speeds"]
+        problems = []
+        for key, r in reports.items():
+            if key in baseline:
+                problems += [f"{key}x {line}" for line in bench.compare(r, baseline[key], args.tolerance)]
+        for line in problems:
+            print("REGRESSION", line)
+        return 1 if problems else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,119 @@
+# search.py
+# In-process fuzzy search over the stories catalog. Titles are indexed by
+# character trigrams (typo tolerant, case-insensitive), descriptions by words
+# (stopwords dropped).
+# catalog.py feeds it at startup and on every add_story, so queries never hit
+# Mongo.
+import math
+import re
+
+MIN_SCORE = 0.3          # below this a hit is noise
+DESCRIPTION_WEIGHT = 0.3
+
+_NON_WORD = re.compile(r"[^\w]+", re.UNICODE)
+# too common to say anything about a story; never indexed or scanned
+STOPWORDS = frozenset("a an the of and or in on at to for from by with as is are was were be this that "
+                      "it its his her their he she they story".split())
+
+def normalize(text):
+    return " ".join(_NON_WORD.sub(" ", (text or "").lower()).split())
+
+def trigrams(text):
+    """Trigrams of each word padded with spaces, so short words and prefixes still match."""
+    grams = set()
+    for word in normalize(text).split():
+        padded = f"  {word} "
+        for i in range(len(padded) - 2):
+            grams.add(padded[i:i + 3])
+    return grams
+
+class SearchIndex:
+    def __init__(self):
+        self._docs = {}        # vision_id -> story card
+        self._title = {}       # vision_id -> (normalized title, trigram set)
+        self._words = {}       # vision_id -> description word set
+        self._grams = {}       # trigram -> set(vision_id)
+        self._postings = {}    # description word -> set(vision_id)
+
+    def __len__(self):
+        return len(self._docs)
+
+    def clear(self):
+        self.__init__()
+
+    def add(self, story):
+        vision = story["vision_id"]
+        if vision in self._docs:
+            self.remove(vision)
+        title = normalize(story.get("title"))
+        grams = trigrams(title)
+        words = set(normalize(story.get("description")).split()) - STOPWORDS
+        self._docs[vision] = story
+        self._title[vision] = (title, grams)
+        self._words[vision] = words
+        for g in grams:
+            self._grams.setdefault(g, set()).add(vision)
+        for w in words:
+            self._postings.setdefault(w, set()).add(vision)
+
+    def remove(self, vision):
+        if vision not in self._docs:
+            return
+        del self._docs[vision]
+        _, grams = self._title.pop(vision)
+        for g in grams:
+            ids = self._grams.get(g)
+            ids.discard(vision)
+            if not ids:
+                del self._grams[g]
+        for w in self._words.pop(vision):
+            ids = self._postings.get(w)
+            ids.discard(vision)
+            if not ids:
+                del self._postings[w]
+
+    def search(self, query, limit=10, min_score=MIN_SCORE):
+        """Best matching story cards, highest score first."""
+        q = normalize(query)
+        if not q:
+            return []
+        q_grams = trigrams(q)
+        q_words = set(q.split()) - STOPWORDS
+        # A title needs at least k shared trigrams to reach min_score on its own.
+        # By pigeonhole such a title contains one of the (n - k + 1) rarest query
+        # trigrams, so only those postings are scanned for candidates. Stopword
+        # trigrams ("the", "of") are in most titles, so candidates come from the
+        # other words when there are any; scoring still uses the whole query.
+        c_grams = trigrams(" ".join(w for w in q.split() if w not in STOPWORDS)) or q_grams
+        k = max(1, math.ceil(min(min_score, MIN_SCORE) / 2 * len(c_grams)))
+        rare = sorted(c_grams, key=lambda g: len(self._grams.get(g, ())))[:len(c_grams) - k + 1]
+        candidates = set()
+        for g in rare:
+            candidates.update(self._grams.get(g, ()))
+        # Same pruning for descriptions: reaching min_score on description words
+        # alone takes k_d of the n query words, so the (n - k_d + 1) rarest
+        # postings hold every such story; none if k_d > n.
+        if q_words:
+            k_d = math.ceil(min(min_score, MIN_SCORE) / DESCRIPTION_WEIGHT * len(q_words))
+            rare_words = sorted(q_words, key=lambda w: len(self._postings.get(w, ())))
+            for w in rare_words[:max(0, len(q_words) - k_d + 1)]:
+                candidates.update(self._postings.get(w, ()))
+        scored = []
+        for vision in candidates:
+            title, grams = self._title[vision]
+            # Dice coefficient on title trigrams
+            score = 2.0 * len(q_grams & grams) / (len(q_grams) + len(grams))
+            if title == q:
+                score += 1.0
+            elif title.startswith(q):
+                score += 0.5
+            elif q in title:
+                score += 0.25
+            if q_words:
+                score += DESCRIPTION_WEIGHT * len(q_words & self._words[vision]) / len(q_words)
+            if score >= min_score:
+                scored.append((-score, vision))
+        scored.sort()
+        return [self._docs[vision] for _, vision in scored[:limit]]
+
+index = SearchIndex()
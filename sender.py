@@ -0,0 +1,208 @@
+# sender.py
+# Central outbound queue for Telegram API calls. Every send goes through a
+# global token bucket (bot-wide ~30 msg/s) and a per-chat token bucket, chats
+# are served round-robin so one busy chat cannot starve the rest, interactive
+# replies jump ahead of bulk sends (also within a chat), and FloodWait is retried after the delay
+# Telegram asks for instead of surfacing as an error. Handlers await send()
+# for a reply or two and post() multi-message deliveries, so a paced chat
+# never holds one of the client's update workers.
+import asyncio
+import contextvars
+import heapq
+import itertools
+import time
+from collections import deque
+from pyrogram.errors import FloodWait
+import config
+import metrics
+
+INTERACTIVE = 0   # direct replies to the user who just acted
+BULK = 1          # media pages, channel posts, owner notifications
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self):
+        """Seconds until a token is available (0 if one is available now)."""
+        now = time.monotonic()
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self):
+        self._refill(time.monotonic())
+        self.tokens -= 1
+
+class _Chat:
+    __slots__ = ("jobs", "bucket", "busy", "blocked_until", "queued", "ticket")
+
+    def __init__(self):
+        self.jobs = deque()   # FIFO per priority so messages arrive in the order they were sent
+        self.bucket = TokenBucket(config.SEND_CHAT_RATE, config.SEND_CHAT_BURST)
+        self.busy = False     # one in-flight call per chat keeps ordering
+        self.blocked_until = 0.0
+        self.queued = False   # present in the ready heap or waiting on a timer
+        self.ticket = None    # seq of this chat's live heap entry; older entries are stale
+
+class Scheduler:
+    def __init__(self):
+        self._chats = {}
+        self._ready = []                 # heap of (priority, seq, chat_id)
+        self._seq = itertools.count()
+        self._global = TokenBucket(config.SEND_GLOBAL_RATE, config.SEND_GLOBAL_RATE)
+        self._wakeup = None
+        self._task = None
+        self.flood_waits = 0
+
+    def set_global_rate(self, rate):
+        """Share of the bot-wide rate for this process (workers.py splits it)."""
+        self._global = TokenBucket(rate, rate)
+
+    def depth(self):
+        """Calls waiting to be sent, across all chats."""
+        return sum(len(c.jobs) for c in self._chats.values())
+
+    def pending(self):
+        """Calls waiting or in flight (bench.py drains posted sends before reporting)."""
+        return sum(len(c.jobs) + c.busy for c in self._chats.values())
+
+    async def submit(self, chat_id, factory, priority=INTERACTIVE):
+        """Queue factory() (a coroutine function) for chat_id and await its result."""
+        return await self.enqueue(chat_id, factory, priority)
+
+    def enqueue(self, chat_id, factory, priority=INTERACTIVE):
+        """Queue factory() for chat_id now and return the future of its result."""
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = loop.create_task(self._run())
+        fut = loop.create_future()
+        chat = self._chats.get(chat_id)
+        if chat is None:
+            chat = self._chats[chat_id] = _Chat()
+        # the call runs in the submitter's context, not the dispatcher's
+        job = (priority, factory, fut, 0, contextvars.copy_context())
+        if priority == INTERACTIVE and chat.jobs and chat.jobs[-1][0] != INTERACTIVE:
+            # a reply to the user's latest action goes ahead of the photos still queued for them
+            i = next(i for i, j in enumerate(chat.jobs) if j[0] != INTERACTIVE)
+            chat.jobs.insert(i, job)
+            if i == 0 and chat.ticket is not None:
+                self._push(chat_id)   # re-queue the chat at interactive priority
+        else:
+            chat.jobs.append(job)
+        self._schedule(chat_id, chat)
+        return fut
+
+    def _schedule(self, chat_id, chat):
+        if chat.queued or chat.busy or not chat.jobs:
+            return
+        chat.queued = True
+        chat.ticket = None
+        wait = max(chat.bucket.delay(), chat.blocked_until - time.monotonic())
+        if wait > 0:
+            asyncio.get_running_loop().call_later(wait, self._push, chat_id)
+        else:
+            self._push(chat_id)
+
+    def _push(self, chat_id):
+        chat = self._chats[chat_id]
+        chat.ticket = next(self._seq)
+        heapq.heappush(self._ready, (chat.jobs[0][0], chat.ticket, chat_id))
+        self._wakeup.set()
+
+    async def _run(self):
+        while True:
+            if not self._ready:
+                self._prune()
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            wait = self._global.delay()
+            if wait > 0:
+                await asyncio.sleep(wait)
+                continue
+            _, seq, chat_id = heapq.heappop(self._ready)
+            chat = self._chats[chat_id]
+            if chat.ticket != seq:
+                continue   # superseded by a re-queue at higher priority
+            chat.queued = False
+            chat.ticket = None
+            # the per-chat bucket may have been drained by a retry since queueing
+            if chat.bucket.delay() > 0 or chat.blocked_until > time.monotonic():
+                self._schedule(chat_id, chat)
+                continue
+            self._global.take()
+            chat.bucket.take()
+            chat.busy = True
+            job = chat.jobs.popleft()
+            job[4].run(asyncio.ensure_future, self._execute(chat_id, chat, job))
+
+    async def _execute(self, chat_id, chat, job):
+        priority, factory, fut, attempts, ctx = job
+        try:
+            result = await factory()
+        except FloodWait as e:
+            self.flood_waits += 1
+            metrics.inc("bot_flood_waits_total", help="FloodWait errors from Telegram")
+            if attempts >= config.SEND_MAX_FLOOD_RETRIES:
+                if not fut.done():
+                    fut.set_exception(e)
+            else:
+                chat.blocked_until = time.monotonic() + float(e.value or 1)
+                chat.jobs.appendleft((priority, factory, fut, attempts + 1, ctx))
+        except Exception as e:
+            if not fut.done():
+                fut.set_exception(e)
+        else:
+            if not fut.done():
+                fut.set_result(result)
+        finally:
+            chat.busy = False
+            self._schedule(chat_id, chat)
+
+    def _prune(self):
+        """Forget idle chats whose bucket has refilled; they'd be recreated identical."""
+        now = time.monotonic()
+        for chat_id, chat in list(self._chats.items()):
+            if chat.jobs or chat.busy or chat.queued or chat.blocked_until > now:
+                continue
+            chat.bucket._refill(now)
+            if chat.bucket.tokens >= chat.bucket.burst:
+                del self._chats[chat_id]
+
+scheduler = Scheduler()
+metrics.gauge("bot_send_queue_depth", scheduler.depth, help="API calls waiting in the send queue")
+
+async def send(chat_id, method, *args, priority=INTERACTIVE, **kwargs):
+    """
+    Rate-limited API call, e.g. send(uid, client.send_photo, uid, file_id, caption=...)
+    or send(message.chat.id, message.reply_text, "hi").
+    """
+    return await scheduler.submit(chat_id, lambda: method(*args, **kwargs), priority)
+
+def post(chat_id, method, *args, priority=BULK, done=None, **kwargs):
+    """
+    Queue an API call without waiting for it; queued right away, so it keeps
+    its place ahead of later send()/post() calls for the chat. done(result)
+    runs once it is sent; failures are logged.
+    """
+    fut = scheduler.enqueue(chat_id, lambda: method(*args, **kwargs), priority)
+    fut.add_done_callback(lambda f: _posted(chat_id, done, f))
+    return fut
+
+def _posted(chat_id, done, fut):
+    if fut.cancelled():
+        return
+    if fut.exception() is not None:
+        print(f"Send to {chat_id} failed:", fut.exception())
+    elif done is not None:
+        done(fut.result())
@@ -0,0 +1,102 @@
+# sessions.py
+# In-memory per-user conversation state in front of the user_states collection.
+# Reads are served from a bounded TTL cache; writes are coalesced and persisted
+# in one bulk_write after STATE_FLUSH_SECONDS (0 = write-through). The Mongo TTL
+# index on user_states.updated_at (see migrations.py) is the durable backstop.
+import asyncio
+import copy
+import datetime
+import adb
+import config
+import metrics
+from cache import TTLCache
+
+# user_id -> (state_dict, in_db) where in_db is True/False if known, None if unknown
+_cache = TTLCache(maxsize=config.STATE_CACHE_SIZE, ttl=config.SESSION_TTL_SECONDS)
+metrics.cache_gauges("sessions", _cache)
+# user_id -> state_dict to upsert, or None to delete (pending write-behind)
+_dirty = {}
+_flush_handle = None
+
+def _expired(doc):
+    updated = doc.get("updated_at")
+    if not updated:
+        return False
+    age = datetime.datetime.utcnow() - updated
+    return age.total_seconds() > config.SESSION_TTL_SECONDS
+
+async def get_state(user_id):
+    if user_id in _dirty:
+        return copy.deepcopy(_dirty[user_id] or {})
+    entry = _cache.get(user_id)
+    if entry is not None:
+        return copy.deepcopy(entry[0])
+    doc = await adb.get_state(user_id)
+    # Mongo's TTL monitor only runs once a minute; don't resurrect stale state
+    if doc and _expired(doc):
+        doc = {}
+    state = {k: v for k, v in doc.items() if k not in ("_id", "updated_at")}
+    _cache.set(user_id, (state, bool(doc)))
+    return copy.deepcopy(state)
+
+async def set_state(user_id, state_dict):
+    state = copy.deepcopy({k: v for k, v in state_dict.items() if k not in ("_id", "updated_at")})
+    entry = _cache.get(user_id)
+    _cache.set(user_id, (state, entry[1] if entry else None))
+    _dirty[user_id] = state
+    await _schedule_flush()
+
+async def clear_state(user_id):
+    entry = _cache.get(user_id)
+    _cache.set(user_id, ({}, entry[1] if entry else None))
+    _dirty[user_id] = None
+    await _schedule_flush()
+
+async def _schedule_flush():
+    global _flush_handle
+    if config.STATE_FLUSH_SECONDS <= 0:
+        await flush()
+        return
+    if _flush_handle is None:
+        loop = asyncio.get_running_loop()
+        _flush_handle = loop.call_later(config.STATE_FLUSH_SECONDS, lambda: asyncio.ensure_future(flush()))
+
+def _take_dirty():
+    """Swap out pending changes, dropping deletes of rows known not to exist."""
+    global _dirty, _flush_handle
+    pending, _dirty = _dirty, {}
+    if _flush_handle is not None:
+        _flush_handle.cancel()
+        _flush_handle = None
+    upserts, deletes = {}, []
+    for user_id, state in pending.items():
+        if state is not None:
+            upserts[user_id] = state
+            continue
+        entry = _cache.get(user_id)
+        if entry is not None and entry[1] is False:
+            continue
+        deletes.append(user_id)
+    return upserts, deletes
+
+def _mark_persisted(upserts, deletes):
+    for user_id, in_db in [(u, True) for u in upserts] + [(u, False) for u in deletes]:
+        entry = _cache.get(user_id)
+        if entry is not None:
+            _cache.set(user_id, (entry[0], in_db))
+
+async def flush():
+    upserts, deletes = _take_dirty()
+    if not upserts and not deletes:
+        return
+    try:
+        await adb.flush_states(upserts, deletes)
+    except Exception as e:
+        # put the changes back (newer writes win) and retry on the next flush
+        print("Failed flushing user states:", e)
+        for user_id, state in list(upserts.items()) + [(u, None) for u in deletes]:
+            _dirty.setdefault(user_id, state)
+        if config.STATE_FLUSH_SECONDS > 0:
+            await _schedule_flush()
+        return
+    _mark_persisted(upserts, deletes)
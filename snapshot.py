@@ -0,0 +1,189 @@
+# snapshot.py
+# Compact on-disk copy of the in-memory catalog (categories, story cards) and
+# the cached episode maps, so a restart doesn't pull whole collections from
+# Mongo. Written atomically every SNAPSHOT_SECONDS and at shutdown, or from
+# Mongo with `python snapshot.py --write`; loaded at startup, then reconciled
+# by fetching only stories created / episodes added after its watermarks.
+# Each episode map carries the time it was read from Mongo, so episodes added
+# by other processes (db_seed.py, other replicas) since then are picked up
+# even when the map was cached long before the snapshot was written.
+#
+# Format: gzip'd JSON lines, written and read as a stream:
+#   {"format": "catalog-snapshot", "version": 2, "written_at": ms, ...}   (other versions are ignored)
+#   ["c", slug, name, count]
+#   ["s", _id hex, vision_id, category, title, description, photo_file_id, created_at ms]
+#   ["e", vision_id, [[start, end, link], ...], loaded_at ms]
+#
+#   python snapshot.py --write [--path FILE]   # e.g. in a deploy step
+#   python snapshot.py --info [--path FILE]
+import argparse
+import asyncio
+import datetime
+import gzip
+import json
+import os
+import sys
+import time
+from bson import ObjectId
+import adb
+import catalog
+import config
+import db
+import epindex
+
+FORMAT = "catalog-snapshot"
+VERSION = 2
+# episodes added while a snapshot was being taken are fetched again; merge skips repeats
+SKEW = datetime.timedelta(seconds=60)
+_EPOCH = datetime.datetime(1970, 1, 1)
+_task = None
+
+def _ms(dt):
+    return int((dt - _EPOCH).total_seconds() * 1000) if dt else None
+
+def _dt(ms):
+    return _EPOCH + datetime.timedelta(milliseconds=ms) if ms is not None else None
+
+def write(path, categories, stories, maps, taken_at):
+    """Stream records to path through a temp file + rename, so a reader never sees half a snapshot."""
+    tmp = f"{path}.tmp"
+    with gzip.open(tmp, "wt", encoding="utf-8", compresslevel=1) as f:
+        header = {"format": FORMAT, "version": VERSION, "written_at": _ms(taken_at),
+                  "categories": len(categories), "stories": len(stories), "maps": len(maps)}
+        f.write(json.dumps(header) + "\n")
+        for c in categories:
+            f.write(json.dumps(["c", c["_id"], c.get("name"), c.get("count", 0)], ensure_ascii=False) + "\n")
+        for s in stories:
+            f.write(json.dumps(["s", str(s["_id"]) if s.get("_id") else None, s["vision_id"], s.get("category"),
+                                s.get("title"), s.get("description"), s.get("photo_file_id"),
+                                _ms(s.get("created_at"))], ensure_ascii=False) + "\n")
+        for vision, (intervals, loaded_at) in maps.items():
+            f.write(json.dumps(["e", vision, intervals, _ms(loaded_at)], ensure_ascii=False) + "\n")
+    os.replace(tmp, path)
+
+def read(path):
+    """(header, category docs, story cards, maps), or None if missing, unreadable or another version."""
+    cats, stories, maps = [], [], {}
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            header = json.loads(f.readline())
+            if header.get("format") != FORMAT or header.get("version") != VERSION:
+                print(f"Ignoring snapshot {path}: unknown format")
+                return None
+            for line in f:
+                r = json.loads(line)
+                if r[0] == "s":
+                    stories.append({"_id": ObjectId(r[1]) if r[1] else None, "vision_id": r[2], "category": r[3],
+                                    "title": r[4], "description": r[5], "photo_file_id": r[6],
+                                    "created_at": _dt(r[7])})
+                elif r[0] == "c":
+                    cats.append({"_id": r[1], "name": r[2], "count": r[3]})
+                elif r[0] == "e":
+                    maps[r[1]] = (r[2], _dt(r[3]))
+    except FileNotFoundError:
+        return None
+    except (OSError, EOFError, ValueError, IndexError) as e:
+        print(f"Ignoring unreadable snapshot {path}: {e}")
+        return None
+    return header, cats, stories, maps
+
+async def warm_start(path=None):
+    """Load the snapshot into catalog / epindex and fetch only the delta from Mongo; False if there is none."""
+    path = path or config.SNAPSHOT_PATH
+    if not path:
+        return False
+    t = time.perf_counter()
+    data = await asyncio.get_running_loop().run_in_executor(None, read, path)
+    if data is None:
+        return False
+    header, cats, stories, maps = data
+    catalog.load(cats, stories)
+    epindex.load_maps(maps)
+    loaded = time.perf_counter() - t
+    # stories: catalog's created_at watermark; categories are small and re-read whole
+    new_stories = await catalog.sync()
+    # episodes: from the oldest map's load time, which may be well before the snapshot was written
+    since = min([_dt(header["written_at"])] + [loaded_at or _EPOCH for _, loaded_at in maps.values()])
+    fetched_at = datetime.datetime.utcnow()
+    new_episodes = await adb.get_episodes_since(since - SKEW)
+    epindex.merge_episodes(new_episodes, fetched_at)
+    if new_episodes:
+        catalog.bump_version()
+    print(f"Warm start from {path}: {len(stories)} stories, {len(maps)} episode maps in {loaded * 1000:.0f}ms, "
+          f"+{new_stories} stories / +{len(new_episodes)} episodes from Mongo "
+          f"in {(time.perf_counter() - t - loaded) * 1000:.0f}ms.")
+    return True
+
+async def save(path=None):
+    """Snapshot the live in-memory state (the file is written on a worker thread)."""
+    path = path or config.SNAPSHOT_PATH
+    if not path:
+        return
+    taken_at = datetime.datetime.utcnow()
+    cats, stories = catalog.export()
+    maps = epindex.export_maps()
+    await asyncio.get_running_loop().run_in_executor(None, write, path, cats, stories, maps, taken_at)
+
+async def _run():
+    while True:
+        await asyncio.sleep(config.SNAPSHOT_SECONDS)
+        try:
+            await save()
+        except Exception as e:
+            print("Writing snapshot failed:", e)
+
+def start():
+    global _task
+    if config.SNAPSHOT_PATH and config.SNAPSHOT_SECONDS > 0:
+        _task = asyncio.ensure_future(_run())
+
+async def stop():
+    """Stop the periodic writer and leave a fresh snapshot for the next start."""
+    global _task
+    if _task is not None:
+        _task.cancel()
+        _task = None
+    if config.SNAPSHOT_PATH:
+        try:
+            await save()
+        except Exception as e:
+            print("Writing snapshot failed:", e)
+
+def write_from_db(path):
+    """Build a snapshot straight from Mongo: every story, episode maps of the newest EPISODE_CACHE_STORIES."""
+    taken_at = datetime.datetime.utcnow()
+    cats = db.get_categories()
+    stories = db.get_all_stories()
+    newest = sorted(stories, key=lambda s: s.get("created_at") or _EPOCH, reverse=True)[:config.EPISODE_CACHE_STORIES]
+    docs = {}
+    for d in db.get_episodes_for(s["vision_id"] for s in newest):
+        docs.setdefault(d["story_vision_id"], []).append(d)
+    maps = {vision: (epindex.EpisodeMap(story_docs).intervals(), taken_at) for vision, story_docs in docs.items()}
+    write(path, cats, stories, maps, taken_at)
+    return len(stories), len(maps)
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Write or inspect the catalog warm-start snapshot.")
+    p.add_argument("--path", default=config.SNAPSHOT_PATH, help="snapshot file (default SNAPSHOT_PATH)")
+    p.add_argument("--write", action="store_true", help="build the snapshot from MongoDB")
+    p.add_argument("--info", action="store_true", help="print the snapshot header")
+    args = p.parse_args(argv)
+    if not args.path:
+        p.error("set SNAPSHOT_PATH or pass --path")
+    if args.write:
+        config.validate(required=("DATABASE_URL",))
+        t = time.perf_counter()
+        n_stories, n_maps = write_from_db(args.path)
+        print(f"wrote {args.path}: {n_stories} stories, {n_maps} episode maps, "
+              f"{os.path.getsize(args.path)} bytes in {time.perf_counter() - t:.2f}s")
+    if args.info or not args.write:
+        data = read(args.path)
+        if data is None:
+            print(f"no usable snapshot at {args.path}")
+            return 1
+        header = data[0]
+        print(json.dumps(dict(header, written_at=str(_dt(header["written_at"])))))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,13 @@
+# test_epindex.py
+from epindex import EpisodeMap
+
+def test_single_episode_prefers_direct_link_over_shortlink():
+    m = EpisodeMap([{"ep_no_start": 1, "ep_no_end": 50, "link": "SHORT"}, {"ep_no": 5, "link": "EP5"}])
+    assert m.cover(5, 5) == ([(5, 5, "EP5")], [])
+    assert m.cover(4, 5) == ([(1, 50, "SHORT")], [])
+
+def test_exact_range_wins_tie():
+    m = EpisodeMap([{"ep_no_start": 1, "ep_no_end": 50, "link": "SHORT"},
+                    {"ep_no_start": 5, "ep_no_end": 10, "link": "S510"}])
+    assert m.cover(5, 10) == ([(5, 10, "S510")], [])
+    assert m.cover(3, 60) == ([(1, 50, "SHORT")], [(51, 60)])
@@ -0,0 +1,37 @@
+# test_handlers.py
+import asyncio
+import pytest
+mongomock = pytest.importorskip("mongomock")
+import bench
+import config
+import db
+import handlers
+import updates
+
+def test_category_paging_with_long_slug(monkeypatch):
+    monkeypatch.setattr(config, "SEND_CHAT_RATE", 1000.0)
+    monkeypatch.setattr(config, "SEND_CHAT_BURST", 1000.0)
+    db.connect(client=mongomock.MongoClient("mongodb://localhost/test_handlers"))
+    db.stories.delete_many({})
+    slug = "award_winning_audio_dramas"
+    db.upsert_category(slug)
+    for n in range(config.EXPLORE_PAGE_SIZE + 3):
+        db.add_story(slug, f"STORY {n}", "PHOTO", "desc", 1)
+    client = bench.FakeClient()
+    user = {"id": 1000, "username": None, "first_name": None}
+
+    async def go():
+        await handlers.send_category_page(client, 1000, slug)
+        await bench.drain_sends()
+        nxt = [b for b in client.buttons(1000) if b.startswith("explore:pg:")]
+        cbq = updates.CallbackQuery(client, {"id": "1", "data": nxt[0], "user": user,
+                                             "message": {"chat_id": 1000, "message_id": 1}})
+        await handlers.on_callback_query(client, cbq)
+        await bench.drain_sends()
+        return nxt[0], client.buttons(1000)
+
+    data, page2 = asyncio.run(go())
+    assert len(data.encode()) <= 64
+    listen = [b for b in page2 if b.startswith("listen:")]
+    assert len(listen) == 3
+    assert any(b.startswith("explore:pg:") and ":p:" in b for b in page2)
@@ -0,0 +1,61 @@
+# test_inbox.py
+import asyncio
+import pytest
+mongomock = pytest.importorskip("mongomock")
+import authz
+import config
+import db
+import inbox
+import search
+
+def _restart():
+    """Drop what this process knows about open groups, as after a restart."""
+    inbox._groups.clear()
+    inbox._by_story.clear()
+    inbox._index = search.SearchIndex()
+    inbox._loaded = False
+
+def test_matching_ask_after_reload_is_persisted():
+    db.connect(client=mongomock.MongoClient("mongodb://localhost/test_inbox"))
+    db.request_groups.delete_many({})
+
+    async def go():
+        group = await inbox.add(1000, "please add moonlight dancer saga")
+        await inbox.flush()
+        _restart()
+        await inbox.ensure_loaded()
+        again = await inbox.add(1001, "moonlight dancer saga pls")
+        await inbox.flush()
+        return group, again
+
+    group, again = asyncio.run(go())
+    assert again["_id"] == group["_id"]
+    doc = db.request_groups.find_one({"_id": group["_id"]})
+    assert doc["count"] == 2
+    assert doc["users"] == [1000, 1001]
+    assert doc["text"] == "please add moonlight dancer saga"
+    assert not inbox._deltas
+
+class _Client:
+    def __init__(self):
+        self.sent_to = []
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.sent_to.append(chat_id)
+
+def test_digest_reaches_owner_and_admins(monkeypatch):
+    monkeypatch.setattr(config, "OWNER_ID", 111)
+    monkeypatch.setattr(config, "ADMIN_IDS", frozenset({222}))
+    db.connect(client=mongomock.MongoClient("mongodb://localhost/test_inbox"))
+    db.request_groups.delete_many({})
+    db.admins.delete_many({})
+    authz.invalidate()
+    client = _Client()
+    monkeypatch.setattr(inbox, "_client", client)
+
+    async def go():
+        await inbox.add(1000, "please add starfall chronicles")
+        await inbox.digest()
+
+    asyncio.run(go())
+    assert sorted(client.sent_to) == [111, 222]
@@ -0,0 +1,10 @@
+# test_search.py
+from search import SearchIndex
+
+def test_stopwords_neither_match_nor_hide_titles():
+    index = SearchIndex()
+    index.add({"vision_id": "fa01", "title": "The Lost King", "description": "A tale of the north"})
+    index.add({"vision_id": "fa02", "title": "Moon River", "description": "the story of the moon and the sea"})
+    assert [s["vision_id"] for s in index.search("the lost king")] == ["fa01"]
+    assert "fa02" not in [s["vision_id"] for s in index.search("the of")]   # only via stopwords
+    assert [s["vision_id"] for s in index.search("sea")] == ["fa02"]
@@ -0,0 +1,70 @@
+# test_sender.py
+import asyncio
+import pytest
+from pyrogram.errors import FloodWait
+import config
+import sender
+
+@pytest.fixture
+def fast(monkeypatch):
+    monkeypatch.setattr(config, "SEND_GLOBAL_RATE", 1000.0)
+    monkeypatch.setattr(config, "SEND_CHAT_RATE", 1000.0)
+    monkeypatch.setattr(config, "SEND_CHAT_BURST", 1000.0)
+    monkeypatch.setattr(config, "SEND_MAX_FLOOD_RETRIES", 2)
+
+def _call(log, name, result=None):
+    async def call():
+        log.append(name)
+        return result
+    return call
+
+def test_per_chat_fifo(fast):
+    log = []
+
+    async def go():
+        s = sender.Scheduler()
+        futs = [s.enqueue(1, _call(log, n), sender.BULK) for n in range(5)]
+        await asyncio.gather(*futs)
+
+    asyncio.run(go())
+    assert log == [0, 1, 2, 3, 4]
+
+def test_interactive_ahead_of_bulk(fast):
+    log = []
+
+    async def go():
+        s = sender.Scheduler()
+        futs = [s.enqueue(chat, _call(log, f"bulk{chat}"), sender.BULK) for chat in (1, 2, 3)]
+        futs.append(s.enqueue(4, _call(log, "reply4"), sender.INTERACTIVE))
+        futs += [s.enqueue(5, _call(log, "bulk5"), sender.BULK), s.enqueue(5, _call(log, "reply5"), sender.INTERACTIVE)]
+        await asyncio.gather(*futs)
+
+    asyncio.run(go())
+    assert log[:2] == ["reply4", "reply5"]
+    assert log.index("reply5") < log.index("bulk5")
+
+def test_flood_wait_retried_then_given_up(fast):
+    attempts = []
+
+    def flaky(failures):
+        async def call():
+            attempts.append(failures)
+            if len([a for a in attempts if a == failures]) <= failures:
+                e = FloodWait(value=1)
+                e.value = 0.01
+                raise e
+            return "sent"
+        return call
+
+    async def go():
+        s = sender.Scheduler()
+        ok = await s.submit(1, flaky(2))
+        with pytest.raises(FloodWait):
+            await s.submit(2, flaky(5))
+        return ok, s.flood_waits
+
+    ok, waits = asyncio.run(go())
+    assert ok == "sent"
+    assert attempts.count(2) == 3        # two FloodWaits, then success
+    assert attempts.count(5) == 3        # first try + SEND_MAX_FLOOD_RETRIES, then the error surfaces
+    assert waits == 2 + 3
@@ -0,0 +1,38 @@
+# test_workers.py
+import queue
+import workers
+
+class _Proc:
+    def __init__(self, alive=True):
+        self.alive = alive
+        self.exitcode = None if alive else 1
+
+    def is_alive(self):
+        return self.alive
+
+def test_dead_worker_is_restarted_before_routing():
+    spawned = []
+
+    def spawn(index):
+        spawned.append(index)
+        return _Proc()
+
+    router = workers.Router([queue.Queue()], [_Proc(alive=False)], spawn)
+    router.route({"kind": "message", "user": {"id": 42}})
+    assert spawned == [0]
+    assert router.processes[0].is_alive()
+    assert router.queues[0].get_nowait()["user"]["id"] == 42
+    assert router.healthy()
+
+def test_crash_looping_worker_fails_readiness():
+    router = workers.Router([queue.Queue(), queue.Queue()], [_Proc(), _Proc()], lambda index: _Proc(alive=False))
+    router.processes[1] = _Proc(alive=False)
+    for _ in range(workers.RESTART_LIMIT + 1):
+        router.healthy()
+    assert router.failed == {1}
+    assert not router.healthy()
+
+def test_no_spawn_means_failed():
+    router = workers.Router([queue.Queue()], [_Proc(alive=False)])
+    assert not router.healthy()
+    assert router.failed == {0}
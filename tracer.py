@@ -0,0 +1,140 @@
+# tracer.py
+# Opt-in update trace recorder (TRACE_PATH). Each handled update becomes one
+# anonymized JSON line appended to the trace file: arrival time, a per-file
+# user pseudonym, the update kind, callback data / message shape, the session
+# action before and after, and handling time. No names, ids, free text or
+# file ids are written. replay.py drives the handlers from such files.
+# With WORKERS > 1 each worker appends to its own TRACE_PATH.<index>.
+#
+#   {"trace": 1, "t0": epoch ms}                               one per process start
+#   {"t": ms, "u": "9f2c01ab", "k": "callback", "d": "listen:fa01", "s0": null, "s1": "listen", "ms": 3.1}
+#   {"t": ms, "u": "9f2c01ab", "k": "message", "m": {"text": "Ep1-10"}, "s0": "listen", "s1": null, "ms": 4.0}
+import asyncio
+import hashlib
+import hmac
+import json
+import os
+import re
+import time
+from contextlib import asynccontextmanager
+import config
+import sessions
+import updates
+
+FLUSH_DELAY = 1.0   # seconds to batch lines before appending them
+
+_salt = os.urandom(16)   # pseudonyms are stable within one run, unlinkable across runs
+_t0 = None               # (epoch seconds, monotonic seconds) of the segment header
+_lines = []
+_flush_handle = None
+_stopped = False
+
+_EPISODE = re.compile(r"^ep\d+(\s*-\s*(ep)?\d+)?$", re.IGNORECASE)
+_VISION = re.compile(r"^[a-z]{2}\d{2,}$")
+_EP_LINE = re.compile(r"^\s*ep\d+", re.IGNORECASE | re.MULTILINE)
+
+def enabled():
+    return bool(config.TRACE_PATH) and not _stopped
+
+def set_path(path):
+    """Per-process trace file (workers.py); call before the first update."""
+    config.TRACE_PATH = path
+
+def pseudonym(user_id):
+    return hmac.new(_salt, str(user_id).encode(), hashlib.sha256).hexdigest()[:8]
+
+def _sampled(pseudo):
+    # whole users are in or out, so their flows stay complete
+    return int(pseudo, 16) / 0xFFFFFFFF < config.TRACE_SAMPLE
+
+def shape(text):
+    """What a message looked like, without its content."""
+    text = (text or "").strip()
+    if not text:
+        return {}
+    if text.startswith("/"):
+        parts = text.split()
+        arg = parts[1] if len(parts) > 1 else ""
+        keep = arg if _VISION.match(arg) or arg == "request" else ""
+        return {"text": f"{parts[0]} {keep}".strip()}
+    if _EPISODE.match(text) or _VISION.match(text.lower()):
+        return {"text": text}
+    if "\n" in text and _EP_LINE.search(text):
+        return {"eplines": len(_EP_LINE.findall(text))}
+    return {"words": len(text.split()), "chars": len(text)}
+
+def _record(d, s0, s1, seconds, arrived):
+    pseudo = pseudonym(d["user"]["id"])
+    if not _sampled(pseudo):
+        return
+    rec = {"t": round((arrived - _t0[1]) * 1000, 1), "u": pseudo, "k": d["kind"]}
+    if d["kind"] == "callback":
+        rec["d"] = d["data"]
+    elif d["kind"] == "inline":
+        rec["m"] = dict(shape(d["query"]), offset=d.get("offset") or "")
+    else:
+        m = shape(d.get("text") or d.get("caption"))
+        if d.get("photo_file_id"):
+            m["photo"] = True
+        if d.get("document"):
+            m["doc_bytes"] = d["document"].get("file_size") or 0
+        rec["m"] = m
+    rec.update(s0=s0, s1=s1, ms=round(seconds * 1000, 2))
+    _lines.append(json.dumps(rec, separators=(",", ":")))
+    _schedule_flush()
+
+@asynccontextmanager
+async def recording(update):
+    """Record the update (Pyrogram object or updates.to_dict form) handled inside the block.
+
+    A no-op unless TRACE_PATH is set.
+    """
+    if not enabled():
+        yield
+        return
+    global _t0
+    if _t0 is None:
+        _t0 = (time.time(), time.monotonic())
+        _lines.append(json.dumps({"trace": 1, "t0": int(_t0[0] * 1000)}))
+    d = update if isinstance(update, dict) else updates.to_dict(update)
+    uid = d["user"]["id"]
+    s0 = (await sessions.get_state(uid)).get("action")
+    arrived = time.monotonic()
+    try:
+        yield
+    finally:
+        seconds = time.monotonic() - arrived
+        s1 = (await sessions.get_state(uid)).get("action")
+        _record(d, s0, s1, seconds, arrived)
+
+def _schedule_flush():
+    global _flush_handle
+    if _flush_handle is None:
+        loop = asyncio.get_running_loop()
+        _flush_handle = loop.call_later(FLUSH_DELAY, lambda: asyncio.ensure_future(flush()))
+
+def _append(lines):
+    global _stopped
+    with open(config.TRACE_PATH, "a", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+        size = f.tell()
+    if size > config.TRACE_MAX_MB * 1024 * 1024:
+        print(f"Trace {config.TRACE_PATH} reached TRACE_MAX_MB; recording stopped.")
+        _stopped = True
+
+async def flush():
+    global _lines, _flush_handle
+    _flush_handle = None
+    lines, _lines = _lines, []
+    if lines:
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, _append, lines)
+        except OSError as e:
+            print("Failed writing trace:", e)
+
+async def stop():
+    global _flush_handle
+    if _flush_handle is not None:
+        _flush_handle.cancel()
+        _flush_handle = None
+    await flush()
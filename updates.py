@@ -0,0 +1,96 @@
+# updates.py
+# Plain-dict form of the updates handlers.py consumes, and lightweight stand-ins
+# for Pyrogram's Message / CallbackQuery / InlineQuery built from those dicts.
+# The stand-ins expose exactly what handlers use (ids, text, photo, document,
+# query, offset, reply_text, edit_text, delete, answer) and route every API call through the given client,
+# so the same handlers run against a real Client, a worker's Client, or the
+# benchmark's fake.
+
+def to_dict(update):
+    """Serialize a Pyrogram Message, CallbackQuery or InlineQuery into a plain dict."""
+    if getattr(update, "query", None) is not None and hasattr(update, "offset"):
+        return {"kind": "inline", "id": update.id, "query": update.query, "offset": update.offset,
+                "user": _user_dict(update.from_user)}
+    if getattr(update, "data", None) is not None and hasattr(update, "answer"):
+        msg = update.message
+        return {
+            "kind": "callback",
+            "id": update.id,
+            "data": update.data,
+            "user": _user_dict(update.from_user),
+            "message": {"chat_id": msg.chat.id, "message_id": msg.id} if msg else None,
+        }
+    d = {
+        "kind": "message",
+        "user": _user_dict(update.from_user),
+        "chat_id": update.chat.id,
+        "message_id": update.id,
+        "text": update.text,
+        "caption": update.caption,
+    }
+    if update.photo:
+        photo = update.photo[-1] if isinstance(update.photo, list) else update.photo
+        d["photo_file_id"] = photo.file_id
+    if update.document:
+        d["document"] = {"file_id": update.document.file_id, "file_size": update.document.file_size,
+                         "file_name": update.document.file_name, "mime_type": update.document.mime_type}
+    return d
+
+def _user_dict(user):
+    return {"id": user.id, "username": user.username, "first_name": user.first_name}
+
+def from_dict(d, client):
+    if d["kind"] == "callback":
+        return CallbackQuery(client, d)
+    if d["kind"] == "inline":
+        return InlineQuery(client, d)
+    return Message(client, d)
+
+class _Obj:
+    def __init__(self, **kw):
+        self.__dict__.update(kw)
+
+class Message:
+    def __init__(self, client, d):
+        self._client = client
+        self.id = d.get("message_id")
+        self.chat = _Obj(id=d["chat_id"])
+        user = d.get("user") or {"id": d["chat_id"], "username": None, "first_name": None}
+        self.from_user = _Obj(**user)
+        self.text = d.get("text")
+        self.caption = d.get("caption")
+        self.photo = [_Obj(file_id=d["photo_file_id"])] if d.get("photo_file_id") else None
+        self.document = _Obj(**d["document"]) if d.get("document") else None
+
+    async def reply_text(self, text, reply_markup=None, **kwargs):
+        return await self._client.send_message(self.chat.id, text, reply_markup=reply_markup, **kwargs)
+
+    async def edit_text(self, text, reply_markup=None, **kwargs):
+        return await self._client.edit_message_text(self.chat.id, self.id, text, reply_markup=reply_markup, **kwargs)
+
+    async def delete(self):
+        return await self._client.delete_messages(self.chat.id, self.id)
+
+class CallbackQuery:
+    def __init__(self, client, d):
+        self._client = client
+        self.id = d["id"]
+        self.data = d.get("data")
+        self.from_user = _Obj(**d["user"])
+        m = d.get("message")
+        self.message = Message(client, {"chat_id": m["chat_id"], "message_id": m["message_id"],
+                                        "user": d["user"]}) if m else None
+
+    async def answer(self, text=None, show_alert=False, **kwargs):
+        return await self._client.answer_callback_query(self.id, text=text, show_alert=show_alert, **kwargs)
+
+class InlineQuery:
+    def __init__(self, client, d):
+        self._client = client
+        self.id = d["id"]
+        self.query = d.get("query") or ""
+        self.offset = d.get("offset") or ""
+        self.from_user = _Obj(**d["user"])
+
+    async def answer(self, results, cache_time=300, **kwargs):
+        return await self._client.answer_inline_query(self.id, results, cache_time=cache_time, **kwargs)
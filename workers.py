@@ -0,0 +1,201 @@
+# workers.py
+# Scale-out mode (WORKERS > 1). bot.py's Client only receives updates and
+# routes each one, as an updates.to_dict payload, to one of WORKERS processes
+# picked by a consistent hash of the user id. All of a user's updates land on
+# the same worker, in order, so their conversation state (sessions.py),
+# episode maps and per-chat send buckets stay local to one process. Each
+# worker runs the ordinary handlers with its own Client (no_updates=True) on
+# updates.from_dict stand-ins. What workers share goes through MongoDB (atomic
+# vision ids, request group deltas); catalogs and open request groups re-sync
+# every WORKER_SYNC_SECONDS. The receiver restarts a worker that dies (its
+# queued updates wait for the new process) and reports not ready if one keeps
+# dying.
+import asyncio
+import multiprocessing
+import signal
+import time
+import traceback
+import adb
+import autodelete
+import catalog
+import config
+import epindex
+import handlers
+import inbox
+import metrics
+import sender
+import sessions
+import snapshot
+import tracer
+import updates
+
+def shard(user_id, buckets):
+    """Jump consistent hash (Lamping & Veach): going from N to N+1 workers moves only 1/(N+1) of users."""
+    key = user_id & 0xFFFFFFFFFFFFFFFF
+    b, j = -1, 0
+    while j < buckets:
+        b = j
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        j = int((b + 1) * (float(1 << 31) / float((key >> 33) + 1)))
+    return b
+
+RESTART_LIMIT = 5       # restarts of one worker within RESTART_WINDOW before giving up on it
+RESTART_WINDOW = 300.0  # seconds
+WATCH_SECONDS = 5.0
+
+class Router:
+    """Receiver side: one queue per worker process; spawn(index) starts a replacement process."""
+    def __init__(self, queues, processes=(), spawn=None):
+        self.queues = queues
+        self.processes = list(processes)
+        self.spawn = spawn
+        self.failed = set()     # workers given up on; their users get no replies
+        self._restarts = {}     # index -> recent restart times
+        self._closing = False
+
+    def route(self, d):
+        index = shard(d["user"]["id"], len(self.queues))
+        self.check(index)
+        self.queues[index].put(d)
+        metrics.inc("bot_updates_routed_total", {"worker": index}, help="Updates handed to each worker")
+
+    def check(self, index):
+        """Restart worker index if its process has died; False if it is down for good."""
+        p = self.processes[index]
+        if self._closing or index in self.failed or p.is_alive():
+            return index not in self.failed
+        now = time.monotonic()
+        recent = [t for t in self._restarts.get(index, []) if now - t < RESTART_WINDOW]
+        metrics.inc("bot_worker_exits_total", {"worker": index}, help="Worker processes that died")
+        if self.spawn is None or len(recent) >= RESTART_LIMIT:
+            print(f"Worker {index} exited (code {p.exitcode}) and is not restarted; its users get no replies.")
+            self.failed.add(index)
+            return False
+        print(f"Worker {index} exited (code {p.exitcode}); restarting.")
+        self._restarts[index] = recent + [now]
+        self.processes[index] = self.spawn(index)
+        return True
+
+    def healthy(self):
+        return all([self.check(i) for i in range(len(self.processes))])
+
+    def close(self, timeout=30):
+        self._closing = True
+        for q in self.queues:
+            q.put(None)
+        for p in self.processes:
+            p.join(timeout)
+
+def start(count):
+    """Spawn count worker processes and return the Router feeding them."""
+    ctx = multiprocessing.get_context("spawn")
+    queues = [ctx.Queue() for _ in range(count)]
+
+    def spawn(index):
+        p = ctx.Process(target=worker_main, args=(index, count, queues[index]), name=f"worker{index}", daemon=True)
+        p.start()
+        return p
+
+    return Router(queues, [spawn(i) for i in range(count)], spawn)
+
+async def watch(router):
+    """Receiver side: restart dead workers even when no updates arrive for them, and keep /readyz honest."""
+    while True:
+        await asyncio.sleep(WATCH_SECONDS)
+        healthy = router.healthy()
+        if metrics.ready and not healthy:
+            print("Not ready: worker(s) down:", sorted(router.failed))
+        metrics.ready = healthy
+
+async def dispatch(client, d):
+    """Run one update dict through the same handlers bot.py wires up."""
+    update = updates.from_dict(d, client)
+    async with tracer.recording(d):
+        await _dispatch(client, d, update)
+
+async def _dispatch(client, d, update):
+    if d["kind"] == "callback":
+        with metrics.track_update("callback", metrics.callback_route(update.data)):
+            await handlers.on_callback_query(client, update)
+    elif d["kind"] == "inline":
+        with metrics.track_update("inline", "search" if update.query.strip() else "latest"):
+            await handlers.on_inline_query(client, update)
+    elif (update.text or "").split(maxsplit=1)[:1] == ["/start"]:
+        with metrics.track_update("command", "start"):
+            await handlers.cmd_start(client, update)
+    else:
+        st = await sessions.get_state(update.from_user.id)
+        with metrics.track_update("message", st.get("action") or "none"):
+            await handlers.on_message(client, update)
+
+async def _handle(client, d, previous):
+    if previous is not None:
+        await asyncio.wait([previous])   # same user: keep arrival order
+    try:
+        await dispatch(client, d)
+    except Exception:
+        traceback.print_exc()
+
+async def serve(queue, client):
+    """Handle update dicts from queue until None; users run concurrently, each user's updates in order."""
+    loop = asyncio.get_running_loop()
+    tails = {}   # user_id -> task handling that user's latest update
+    while True:
+        d = await loop.run_in_executor(None, queue.get)
+        if d is None:
+            break
+        uid = d["user"]["id"]
+        task = asyncio.ensure_future(_handle(client, d, tails.get(uid)))
+        tails[uid] = task
+        task.add_done_callback(lambda t, uid=uid: tails.pop(uid) if tails.get(uid) is t else None)
+    if tails:
+        await asyncio.wait(list(tails.values()))
+
+async def _sync_loop():
+    while True:
+        await asyncio.sleep(config.WORKER_SYNC_SECONDS)
+        try:
+            await catalog.sync()
+            await inbox.sync()
+        except Exception as e:
+            print("Worker sync failed:", e)
+
+async def _worker(index, count, queue, client):
+    sender.scheduler.set_global_rate(config.SEND_GLOBAL_RATE / count)
+    if config.TRACE_PATH:
+        tracer.set_path(f"{config.TRACE_PATH}.{index}")
+    epindex.expire_after(config.WORKER_SYNC_SECONDS)
+    server = await metrics.start_server(config.PORT + 1 + index) if config.PORT else None
+    async with client:
+        if not await snapshot.warm_start():
+            await catalog.ensure_loaded()
+        if index == 0:
+            snapshot.start()   # one writer; every worker warm-starts from it
+        await autodelete.start(client, owns=lambda chat_id: shard(chat_id, count) == index)
+        await inbox.start(client, digests=index == 0)
+        sync = asyncio.ensure_future(_sync_loop())
+        metrics.ready = True
+        print(f"Worker {index} ready.")
+        await serve(queue, client)
+        metrics.ready = False
+        sync.cancel()
+        await autodelete.stop()
+        await inbox.stop()
+        await sessions.flush()
+        await tracer.stop()
+        if index == 0:
+            await snapshot.stop()
+    if server:
+        server.close()
+
+def worker_main(index, count, queue):
+    """Process entry point; the receiver has already validated config and the schema."""
+    from pyrogram import Client
+    # Ctrl-C reaches the whole process group; shut down via the receiver's sentinel instead
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    client = Client(f"worker{index}", bot_token=config.BOT_TOKEN, api_id=config.API_ID, api_hash=config.API_HASH,
+                    in_memory=True, no_updates=True)
+    try:
+        client.run(_worker(index, count, queue, client))
+    finally:
+        adb.shutdown()